@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class FakeWebClient:
+    """
+    Stand-in for `slack.WebClient` that records the calls the bot makes
+    instead of sending them. Clients created with the same `calls` list
+    (e.g. one per worker thread) record into it together.
+
+    Parameters
+    ----------
+    token, timeout
+        Accepted for compatibility with `WebClient` and ignored
+    latency : float
+        Seconds every call takes, to mimic the Slack API
+    calls : list
+        List that (api method, keyword arguments) tuples are appended to
+    """
+    def __init__(self, token=None, timeout=None, latency=0.0, calls=None):
+        self.latency = latency
+        self.calls = calls if calls is not None else []
+        self._lock = threading.Lock()
+
+    def _record(self, api_method, kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls.append((api_method, kwargs))
+        return {"ok": True, "ts": "{:.6f}".format(time.time())}
+
+    def chat_postMessage(self, **kwargs):
+        return self._record("chat.postMessage", kwargs)
+
+    def files_upload(self, **kwargs):
+        return self._record("files.upload", kwargs)
+
+    def api_call(self, api_method, **kwargs):
+        if api_method == "auth.test":
+            return {"ok": True, "user_id": "U0BENCH"}
+        return self._record(api_method, kwargs)
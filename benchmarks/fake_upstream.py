@@ -0,0 +1,175 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from datetime import date, timedelta
+import threading
+import hashlib
+import json
+import math
+import time
+import os
+
+# Recordings written by `benchmarks/record.py`
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings')
+
+# Countries (name, slug, ISO2) served when there are no recordings
+SYNTHETIC_COUNTRIES = [
+    ("United States of America", "united-states", "US"), ("United Kingdom", "united-kingdom", "GB"),
+    ("France", "france", "FR"), ("Germany", "germany", "DE"), ("Italy", "italy", "IT"),
+    ("Spain", "spain", "ES"), ("India", "india", "IN"), ("China", "china", "CN"),
+    ("Japan", "japan", "JP"), ("Korea (South)", "korea-south", "KR"), ("Brazil", "brazil", "BR"),
+    ("Canada", "canada", "CA"), ("Mexico", "mexico", "MX"), ("Russian Federation", "russia", "RU"),
+    ("Australia", "australia", "AU"), ("New Zealand", "new-zealand", "NZ"), ("Iran, Islamic Republic of", "iran", "IR"),
+    ("Turkey", "turkey", "TR"), ("Sweden", "sweden", "SE"), ("Norway", "norway", "NO"),
+    ("Denmark", "denmark", "DK"), ("Netherlands", "netherlands", "NL"), ("Belgium", "belgium", "BE"),
+    ("Switzerland", "switzerland", "CH"), ("Austria", "austria", "AT"), ("Portugal", "portugal", "PT"),
+    ("Ireland", "ireland", "IE"), ("Poland", "poland", "PL"), ("South Africa", "south-africa", "ZA"),
+    ("Egypt", "egypt", "EG"), ("Nigeria", "nigeria", "NG"), ("Kenya", "kenya", "KE"),
+    ("Singapore", "singapore", "SG"), ("Malaysia", "malaysia", "MY"), ("Indonesia", "indonesia", "ID"),
+    ("Philippines", "philippines", "PH"), ("Viet Nam", "vietnam", "VN"), ("Pakistan", "pakistan", "PK"),
+    ("Argentina", "argentina", "AR"), ("Chile", "chile", "CL"), ("Peru", "peru", "PE"),
+    ("Colombia", "colombia", "CO"), ("Congo (Brazzaville)", "congo-brazzaville", "CG"),
+    ("Congo (Kinshasa)", "congo-kinshasa", "CD"), ("Hong Kong, SAR China", "hong-kong-sar-china", "HK"),
+]
+
+SYNTHETIC_START = date(2020, 1, 22)
+SYNTHETIC_DAYS = 160
+
+_STATUS_SCALE = {"confirmed": 1.0, "recovered": 0.6, "deaths": 0.05}
+
+
+def _synthetic_cases(slug, status, days):
+    """Deterministic logistic cumulative curve for a country and status."""
+    seed = int(hashlib.md5(slug.encode('utf-8')).hexdigest(), 16)
+    peak = (seed % 900000 + 1000) * _STATUS_SCALE[status]
+    midpoint = 60 + seed % 60
+    lag = {"confirmed": 0, "recovered": 14, "deaths": 7}[status]
+    return [int(peak / (1 + math.exp(-(day - midpoint - lag) / 9))) for day in range(days)]
+
+
+class FakeCovidApi:
+    """
+    Local stand-in for https://api.covid19api.com, serving the `/countries`,
+    `/summary` and `/total/country/{slug}/status/{status}` endpoints (with
+    the `?from=&to=` date range) from a background thread.
+
+    Responses are replayed from the recordings in `recordings_dir` when
+    there are any (see `benchmarks/record.py`). Otherwise deterministic
+    synthetic responses of the same shape are served for
+    `SYNTHETIC_COUNTRIES`.
+
+    Parameters
+    ----------
+    latency : float
+        Seconds every response is delayed by, to mimic the network
+    recordings_dir : str
+        Directory with recorded responses
+
+    Attributes
+    ----------
+    url: Base URL to pass as `COVIDInfoApi(api_url=...)`
+    requests: Number of requests served
+    """
+    def __init__(self, latency=0.0, recordings_dir=RECORDINGS_DIR):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._recordings_dir = recordings_dir
+        self._countries = self._load('countries.json')
+        self._summary = self._load('summary.json')
+        if self._countries is None:
+            self._countries = [{"Country": "", "Slug": "", "ISO2": ""}] + \
+                [{"Country": name, "Slug": slug, "ISO2": iso2} for name, slug, iso2 in SYNTHETIC_COUNTRIES]
+        if self._summary is None:
+            self._summary = self._synthetic_summary()
+        self._server = None
+
+    def _load(self, *path):
+        full_path = os.path.join(self._recordings_dir, *path)
+        if not os.path.exists(full_path):
+            return None
+        with open(full_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _synthetic_summary(self):
+        as_of = SYNTHETIC_START + timedelta(days=SYNTHETIC_DAYS - 1)
+        rows = []
+        for name, slug, iso2 in SYNTHETIC_COUNTRIES:
+            row = {"Country": name, "CountryCode": iso2, "Slug": slug,
+                   "Date": as_of.isoformat() + "T00:00:00Z"}
+            for status, key in (("confirmed", "Confirmed"), ("recovered", "Recovered"), ("deaths", "Deaths")):
+                cases = _synthetic_cases(slug, status, SYNTHETIC_DAYS)
+                row["Total" + key] = cases[-1]
+                row["New" + key] = cases[-1] - cases[-2]
+            rows.append(row)
+        return {"Global": {}, "Countries": rows, "Date": as_of.isoformat() + "T00:00:00Z"}
+
+    def series(self, slug, status):
+        """Full recorded (or synthetic) `/total/country` payload, or None for an unknown country."""
+        recorded = self._load('total', '{}_{}.json'.format(slug, status))
+        if recorded is not None:
+            return recorded
+        if slug not in {row["Slug"] for row in self._countries} or status not in _STATUS_SCALE:
+            return None
+        return [{"Country": slug, "CountryCode": "", "Lat": "0", "Lon": "0", "Cases": cases,
+                 "Status": status, "Date": (SYNTHETIC_START + timedelta(days=day)).isoformat() + "T00:00:00Z"}
+                for day, cases in enumerate(_synthetic_cases(slug, status, SYNTHETIC_DAYS))]
+
+    def _respond(self, path, query):
+        parts = path.strip('/').split('/')
+        if parts == ['countries']:
+            return self._countries
+        if parts == ['summary']:
+            return self._summary
+        if len(parts) == 5 and parts[0] == 'total' and parts[1] == 'country' and parts[3] == 'status':
+            payload = self.series(parts[2], parts[4])
+            if payload is not None and 'from' in query:
+                start, end = query['from'][0][:10], query.get('to', ['9999-12-31'])[0][:10]
+                payload = [row for row in payload if start <= row['Date'][:10] <= end]
+            return payload
+        return None
+
+    def start(self):
+        """Start serving on a free local port. Returns self."""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+            def do_GET(self):
+                with api._lock:
+                    api.requests += 1
+                if api.latency:
+                    time.sleep(api.latency)
+                url = urlsplit(self.path)
+                payload = api._respond(url.path, parse_qs(url.query))
+                if payload is None:
+                    self.send_error(404)
+                    return
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='fake-covid-api', daemon=True).start()
+        return self
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    @property
+    def slugs(self):
+        return [row["Slug"] for row in self._countries[1:]]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,54 @@
+"""
+Record responses from https://api.covid19api.com for `FakeCovidApi` to
+replay:
+
+    python -m benchmarks.record [slug ...]
+
+Records `/countries`, `/summary` and the full histories of every status for
+the given country codes (by default the countries used by the benchmarks).
+"""
+import argparse
+import json
+import os
+import time
+
+import requests
+
+from benchmarks.fake_upstream import RECORDINGS_DIR
+from benchmarks.run import BENCH_COUNTRIES
+
+API_URL = 'https://api.covid19api.com'
+
+
+def _save(payload, *path):
+    full_path = os.path.join(RECORDINGS_DIR, *path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f)
+
+
+def _get(session, path):
+    r = session.get(API_URL + path, timeout=(3.05, 30))
+    r.raise_for_status()
+    # The public API allows a few calls per second
+    time.sleep(0.5)
+    return r.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('slugs', nargs='*', default=BENCH_COUNTRIES)
+    args = parser.parse_args()
+
+    with requests.Session() as session:
+        _save(_get(session, '/countries'), 'countries.json')
+        _save(_get(session, '/summary'), 'summary.json')
+        for slug in args.slugs:
+            for status in ('confirmed', 'recovered', 'deaths'):
+                _save(_get(session, '/total/country/{}/status/{}'.format(slug, status)),
+                      'total', '{}_{}.json'.format(slug, status))
+                print("Recorded {}/{}".format(slug, status))
+
+
+if __name__ == "__main__":
+    main()
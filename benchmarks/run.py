@@ -0,0 +1,243 @@
+"""
+Benchmarks for the bot's hot paths, run against a local stand-in for the
+covid19api (see `fake_upstream.py`) and a fake Slack client:
+
+    python -m benchmarks.run [--iterations N] [--save results.json]
+                             [--compare baseline.json]
+
+Reports throughput and p50/p99 latency of the bot's startup (imports),
+`MessageProcessor.process`, `COVIDInfoApi.get_live_country_info`,
+`COVIDInfoApi.compare_country_plot` and end-to-end `main.msg_detected`
+(from the RTM callback until every reply is posted). With `--compare`, exits with status 1 if any benchmark's p99
+latency or throughput is more than `--tolerance` worse than the baseline.
+"""
+import subprocess
+import argparse
+import itertools
+import threading
+import json
+import time
+import sys
+import os
+
+import numpy as np
+
+from benchmarks.fake_upstream import FakeCovidApi
+from benchmarks.fake_slack import FakeWebClient
+from covid_info_api import COVIDInfoApi
+from message_processor import MessageProcessor
+from output_formatter import _OutputFormatter
+from dispatcher import ChannelDispatcher
+
+BOT_ID = 'u0bench'
+
+# Country codes the benchmarks ask about
+BENCH_COUNTRIES = ['united-states', 'united-kingdom', 'france', 'germany', 'italy', 'spain',
+                   'india', 'korea-south', 'japan', 'china', 'brazil', 'canada']
+
+MESSAGES = [
+    "hi <@{bot}> how many confirmed cases are there in france?",
+    "<@{bot}> plot the deaths in italy, spain and germany",
+    "<@{bot}> what are the symptoms?",
+    "<@{bot}> recovered cases in the united states and uk",
+    "<@{bot}> how are you doing today",
+    "<@{bot}> how does it spread and how do i prevent it",
+    "<@{bot}> tell me about yourself",
+    "<@{bot}> show a chart of confirmed cases in south korea, japan and china",
+    "<@{bot}> is there a vaccine or a cure yet",
+    "<@{bot}> india brazil canada",
+    "<@{bot}> thanks a lot, bye!",
+]
+MESSAGES = [message.format(bot=BOT_ID) for message in MESSAGES]
+
+PLOT_REQUESTS = [
+    (['france'], 'confirmed'),
+    (['italy', 'spain', 'germany'], 'deaths'),
+    (['united-states', 'united-kingdom'], 'all'),
+    (['korea-south', 'japan', 'china', 'india'], 'recovered'),
+]
+
+
+def measure(name, func, args_cycle, iterations, warmup=5):
+    """
+    Call `func(*args)` `iterations` times with arguments taken in turn from
+    `args_cycle`, after `warmup` unmeasured calls.
+
+    Returns
+    -------
+    dict: name, number of calls, calls per second, p50 and p99 latency in
+        milliseconds
+    """
+    args_cycle = itertools.cycle(args_cycle)
+    for _ in range(warmup):
+        func(*next(args_cycle))
+
+    latencies = np.empty(iterations)
+    start = time.perf_counter()
+    for i in range(iterations):
+        args = next(args_cycle)
+        t0 = time.perf_counter()
+        func(*args)
+        latencies[i] = time.perf_counter() - t0
+    elapsed = time.perf_counter() - start
+
+    return {"name": name, "n": iterations, "throughput": iterations / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000)}
+
+
+def bench_startup(iterations):
+    """
+    Time a fresh interpreter importing the modules every bot process loads
+    (not the plotting stack, which is imported on the first plot).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, '-c', 'import covid_info_api, message_processor, output_formatter']
+    return measure("startup (interpreter + imports)",
+                   lambda: subprocess.run(command, cwd=root, check=True), [()], iterations, warmup=1)
+
+
+def bench_process(api, iterations):
+    processor = MessageProcessor(api)
+    return measure("MessageProcessor.process", processor.process,
+                   [(message,) for message in MESSAGES], iterations)
+
+
+def bench_live_info(api, iterations):
+    pairs = [(country, status) for country in BENCH_COUNTRIES
+             for status in ('confirmed', 'recovered', 'deaths')]
+    return measure("COVIDInfoApi.get_live_country_info", api.get_live_country_info, pairs, iterations)
+
+
+def bench_compare_plot(api, iterations):
+    return measure("COVIDInfoApi.compare_country_plot", api.compare_country_plot,
+                   PLOT_REQUESTS, iterations, warmup=len(PLOT_REQUESTS))
+
+
+def bench_msg_detected(api, iterations, workers=4, channels=16, slack_latency=0.0):
+    """
+    End-to-end benchmarks of `main.msg_detected` with the reply dispatcher
+    and a fake Slack client. Returns [] if `main` can't be imported (the
+    slack client is not installed).
+    """
+    try:
+        import main
+        from slack_outbox import SlackOutbox
+    except ImportError as e:
+        print("Skipping msg_detected: {}".format(e), file=sys.stderr)
+        return []
+
+    calls = []
+    main.WebClient = lambda token, timeout=None: FakeWebClient(latency=slack_latency, calls=calls)
+    main._worker_state = threading.local()
+    main.slack_bot_token = 'xoxb-bench'
+    main.bot_id = BOT_ID
+    main.api_object = api
+    main.msg_processor = MessageProcessor(api)
+    main._output_formatter = _OutputFormatter()
+    main.outbox = SlackOutbox(main._worker_web_client)
+    main._payload_log_rate = 0
+    main.dispatcher = ChannelDispatcher(max_workers=workers)
+
+    def payload(i, channel):
+        return {"data": {"client_msg_id": str(i), "type": "message", "user": "U0USER",
+                         "text": MESSAGES[i % len(MESSAGES)], "channel": channel},
+                "web_client": None, "rtm_client": None}
+
+    def one_message(i):
+        main.msg_detected(**payload(i, 'C0BENCH'))
+        main.dispatcher.join()
+        main.outbox.join()
+
+    results = [measure("msg_detected (one at a time)", one_message,
+                       [(i,) for i in range(len(MESSAGES))], iterations, warmup=len(MESSAGES))]
+
+    # Burst of messages spread over several channels, answered concurrently
+    start = time.perf_counter()
+    for i in range(iterations):
+        main.msg_detected(**payload(i, 'C{:04d}'.format(i % channels)))
+    main.dispatcher.join()
+    main.outbox.join()
+    elapsed = time.perf_counter() - start
+    results.append({"name": "msg_detected (burst, {} channels)".format(channels), "n": iterations,
+                    "throughput": iterations / elapsed, "p50_ms": None, "p99_ms": None})
+
+    main.dispatcher.shutdown()
+    main.outbox.shutdown()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns
+    -------
+    [str]: One line per benchmark whose p99 latency or throughput is more
+        than `tolerance` (a fraction) worse than in `baseline`
+    """
+    previous = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(result["name"])
+        if before is None:
+            continue
+        if before["p99_ms"] and result["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+            regressions.append("{}: p99 {:.3f} ms -> {:.3f} ms".format(
+                               result["name"], before["p99_ms"], result["p99_ms"]))
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append("{}: throughput {:.1f}/s -> {:.1f}/s".format(
+                               result["name"], before["throughput"], result["throughput"]))
+    return regressions
+
+
+def _format_ms(value):
+    return "{:10.3f}".format(value) if value is not None else "{:>10}".format("-")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200,
+                        help="Measured calls per benchmark (a tenth of it for plots)")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Seconds each fake upstream response is delayed by")
+    parser.add_argument('--slack-latency', type=float, default=0.0,
+                        help="Seconds each fake Slack call takes")
+    parser.add_argument('--workers', type=int, default=4, help="Reply dispatcher workers")
+    parser.add_argument('--render-mode', default='thread', choices=['thread', 'process'])
+    parser.add_argument('--save', help="Write the results to this JSON file")
+    parser.add_argument('--compare', help="Baseline JSON file written with --save")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed fraction by which a result may be worse than the baseline")
+    args = parser.parse_args()
+
+    upstream = FakeCovidApi(latency=args.latency).start()
+    api = COVIDInfoApi(api_url=upstream.url, rate_limit=None, render_mode=args.render_mode)
+
+    results = [bench_startup(max(args.iterations // 20, 3)),
+               bench_process(api, args.iterations),
+               bench_live_info(api, args.iterations),
+               bench_compare_plot(api, max(args.iterations // 10, 5))]
+    results += bench_msg_detected(api, args.iterations, workers=args.workers,
+                                  slack_latency=args.slack_latency)
+
+    print("{:<40} {:>6} {:>12} {:>10} {:>10}".format("benchmark", "n", "ops/s", "p50 ms", "p99 ms"))
+    for result in results:
+        print("{:<40} {:>6} {:>12.1f} {} {}".format(result["name"], result["n"], result["throughput"],
+                                                    _format_ms(result["p50_ms"]), _format_ms(result["p99_ms"])))
+    print("Upstream requests: {}".format(upstream.requests))
+    upstream.stop()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION " + line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
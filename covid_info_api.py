@@ -1,27 +1,562 @@
-from collections import defaultdict
-import requests, json, math
-from requests.exceptions import ConnectionError
+from collections import OrderedDict, Counter
+import requests
+import threading
+import time
+import random
+import heapq
+import itertools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
 import logging
-from datetime import date
+from datetime import date, timedelta
 
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-plt.style.use('fivethirtyeight')
+from utils import CountryIndex
+from series import parse_series, merge_series
+from derived_metrics import DerivedMetricsCache
+from ranking import RankingIndex
+from plotting import PlotRenderer, build_comparison_figure  # matplotlib itself is imported on first use
+from instrumentation import metrics
 
-from utils import CaseAgnosticDict
 
-
-# Set up logging
-logging.basicConfig(filename='../covidbot.log',
-                    filemode='a',
-                    format='%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S',
-                    level=logging.INFO
-                    )
 logger = logging.getLogger(__name__)
 
 
+# Priority classes for upstream calls, most urgent first. When the request
+# budget is tight, live lookups go ahead of plot histories, which go ahead
+# of background refreshes.
+PRIORITY_LIVE = 0
+PRIORITY_PLOT = 1
+PRIORITY_BACKGROUND = 2
+
+
+# Alternate country names, on top of the names the API knows
+COUNTRY_ALIASES = {
+    'congo b': 'congo-brazzaville',
+    'congo brazzaville': 'congo-brazzaville',
+    'palestine': 'palestine',
+    'palestinian': 'palestine',
+    'sao tome': 'sao-tome-and-principe',
+    'british indian ocean': 'british-indian-ocean-territory',
+    'uae': 'united-arab-emirates',
+    'falkland islands malvinas': 'falkland-islands-malvinas',
+    # 'saint martin french part': 'saint-martin-french-part',
+    # 'saint martin french': 'saint-martin-french-part',
+    'holy see vatican city state': 'holy-see-vatican-city-state',
+    'vatican city': 'holy-see-vatican-city-state',
+    'vatican': 'holy-see-vatican-city-state',
+    'cote divoire': 'cote-divoire',
+    'iran': 'iran',
+    'macedonia': 'macedonia',
+    'cocos keeling islands': 'cocos-keeling-islands',
+    'uk': 'united-kingdom',
+    'congo kinshasa': 'congo-kinshasa',
+    'congo k': 'congo-kinshasa',
+    'united states': 'united-states',
+    'us': 'united-states',
+    'usa': 'united-states',
+    'guinea bissau': 'guinea-bissau',
+    'syria': 'syria',
+    # 'north korea': 'korea-north',
+    'venezuela': 'venezuela',
+    'timor leste': 'timor-leste',
+    'south korea': 'korea-south',
+    'vietnam': 'vietnam',
+    'us virgin islands': 'virgin-islands',
+    'macao': 'macao-sar-china',
+    'hong kong': 'hong-kong-sar-china',
+    'hk': 'hong-kong-sar-china',
+    'saint-barthelemy': 'saint-barthélemy',
+    'barthelemy': 'saint-barthélemy',
+    'micronesia': 'micronesia',
+}
+
+
+class UpstreamError(Exception):
+    """Raised when https://covid19api.com answers with a non-200 status code."""
+    pass
+
+
+class RateLimitExceeded(UpstreamError):
+    """Raised when a call can't get a token from the client-side rate limiter in time."""
+    pass
+
+
+class _Priority:
+    """
+    Priority class of a call in flight, which callers sharing the call (see
+    `_SingleFlight`) can make more urgent while it waits for a token.
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def __int__(self):
+        return self.value
+
+    def __repr__(self):
+        return "_Priority({})".format(self.value)
+
+
+class _TokenBucket:
+    """
+    Thread-safe token bucket rate limiter with priority classes. Callers 
+    queue by priority (then arrival order) and each takes one token; tokens
+    refill at `rate` per second up to `capacity`.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second (sustained requests per second)
+    capacity : int
+        Maximum number of tokens (burst size)
+    max_wait : dict
+        Priority -> maximum number of seconds a caller of that priority waits
+        for a token before giving up
+
+    Attributes
+    ----------
+    stats: A dictionary of counters ("granted", "rejected", "max_queue_depth")
+    """
+    DEFAULT_MAX_WAIT = {PRIORITY_LIVE: 2, PRIORITY_PLOT: 10, PRIORITY_BACKGROUND: 30}
+
+    def __init__(self, rate, capacity, max_wait=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = dict(self.DEFAULT_MAX_WAIT)
+        self.max_wait.update(max_wait or {})
+        self.stats = {"granted": 0, "rejected": 0, "max_queue_depth": 0}
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._waiting = []  # heap of (priority, arrival number)
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _max_wait(self, priority):
+        return self.max_wait.get(priority, max(self.max_wait.values()))
+
+    def acquire(self, priority=PRIORITY_LIVE):
+        """
+        Wait for a token, at most `max_wait[priority]` seconds. `priority` 
+        is a priority class or a `_Priority`: if that is made more urgent 
+        while we wait (call `wake` then), we move up the queue and wait at 
+        most as long as its new class allows.
+
+        Returns
+        -------
+        bool: True if a token was taken, False if the wait timed out
+        """
+        level = int(priority)
+        deadline = time.monotonic() + self._max_wait(level)
+        with self._cond:
+            ticket = [level, next(self._arrivals)]
+            heapq.heappush(self._waiting, ticket)
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self._waiting))
+            try:
+                while True:
+                    if int(priority) < ticket[0]:
+                        ticket[0] = int(priority)
+                        heapq.heapify(self._waiting)
+                        deadline = min(deadline, time.monotonic() + self._max_wait(ticket[0]))
+                    self._refill()
+                    first_in_line = self._waiting[0] is ticket
+                    if first_in_line and self._tokens >= 1:
+                        self._tokens -= 1
+                        self.stats["granted"] += 1
+                        return True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["rejected"] += 1
+                        return False
+                    if first_in_line:
+                        remaining = min(remaining, (1 - self._tokens) / self.rate)
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def wake(self):
+        """Make waiting callers check their priority again (see `acquire`)."""
+        with self._cond:
+            self._cond.notify_all()
+
+    def queue_depths(self):
+        """Number of callers currently waiting, per priority (dict)."""
+        with self._cond:
+            return dict(Counter(priority for priority, _ in self._waiting))
+
+
+class _HttpClient:
+    """
+    Thin wrapper around a connection-pooled `requests.Session` that adds
+    connect/read timeouts and bounded retries with jittered exponential
+    backoff on 429/5xx responses and network errors.
+
+    Parameters
+    ----------
+    pool_size : int
+        Maximum number of keep-alive connections kept per host.
+    timeout : (float, float)
+        (connect, read) timeout in seconds for every request.
+    max_retries : int
+        Number of retries after the first attempt before giving up.
+    backoff_factor : float
+        Base delay in seconds. The n-th retry sleeps a random duration in
+        [0.5, 1] * min(backoff_cap, backoff_factor * 2**n), or for the number 
+        of seconds in a 429 `Retry-After` header when that is larger.
+    backoff_cap : float
+        Upper bound in seconds for a single backoff sleep.
+    limiter : _TokenBucket
+        If given, every attempt (including retries) first takes a token.
+
+    Attributes
+    ----------
+    stats: A dictionary of counters ("requests", "retries", "timeouts",
+        "connection_errors", "failures")
+    """
+    RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, pool_size=10, timeout=(3.05, 10), max_retries=3,
+                 backoff_factor=0.5, backoff_cap=8, limiter=None):
+        self.limiter = limiter
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.backoff_cap = backoff_cap
+
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session = requests.Session()
+        self._session.mount('https://', self._adapter)
+        self._session.mount('http://', self._adapter)
+
+        self.stats = dict.fromkeys(['requests', 'retries', 'timeouts', 
+                                    'connection_errors', 'failures'], 0)
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = min(self.backoff_cap, self.backoff_factor * 2 ** attempt)
+        delay *= random.uniform(0.5, 1)
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, min(self.backoff_cap, int(retry_after)))
+        time.sleep(delay)
+
+    @staticmethod
+    def _endpoint(url):
+        """Short endpoint name of an API url, used as a metrics label."""
+        if '/total/country/' in url:
+            return 'series_range' if '?from=' in url else 'series'
+        return url.rsplit('/', 1)[-1]
+
+    def _timed_get(self, url):
+        endpoint = self._endpoint(url)
+        start = time.perf_counter()
+        try:
+            r = self._session.get(url, timeout=self.timeout)
+        except (ConnectionError, Timeout) as e:
+            metrics.inc("covidbot_upstream_responses_total", endpoint=endpoint, code=type(e).__name__)
+            raise
+        finally:
+            metrics.observe("covidbot_upstream_seconds", time.perf_counter() - start, endpoint=endpoint)
+        metrics.inc("covidbot_upstream_responses_total", endpoint=endpoint, code=r.status_code)
+        return r
+
+    def get(self, url, priority=PRIORITY_LIVE):
+        """
+        GET `url`, retrying on 429/5xx responses, timeouts and connection errors.
+        `priority` is the rate limiter class of the call.
+
+        Returns
+        -------
+        requests.Response: The last response received. Its status code may 
+            still be 429/5xx once retries are exhausted.
+
+        Raises
+        ------
+        ConnectionError, Timeout
+            If the last attempt failed at the network level
+        RateLimitExceeded
+            If the rate limiter had no token for us in time
+        """
+        attempt = 0
+        while True:
+            if self.limiter is not None and not self.limiter.acquire(priority):
+                raise RateLimitExceeded("Request budget exhausted for {}".format(url))
+            self._count('requests')
+            try:
+                r = self._timed_get(url)
+            except (ConnectionError, Timeout) as e:
+                self._count('timeouts' if isinstance(e, Timeout) else 'connection_errors')
+                if attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                logger.warning("Retrying {} after {!r}".format(url, e))
+                self._count('retries')
+                self._backoff(attempt)
+                attempt += 1
+                continue
+
+            if r.status_code not in self.RETRY_STATUS_CODES:
+                return r
+            if attempt >= self.max_retries:
+                self._count('failures')
+                return r
+            logger.warning("Retrying {} after status {}".format(url, r.status_code))
+            self._count('retries')
+            self._backoff(attempt, r.headers.get('Retry-After'))
+            attempt += 1
+
+    def pool_stats(self):
+        """
+        Connection reuse counters summed over all the pooled hosts.
+
+        Returns
+        -------
+        dict: {"pool_connections": new connections opened, "pool_requests": 
+            requests sent over the pools, "pool_reused": requests that used a
+            kept-alive connection}
+        """
+        connections = requests_sent = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                requests_sent += pool.num_requests
+        return {"pool_connections": connections, 
+                "pool_requests": requests_sent,
+                "pool_reused": max(0, requests_sent - connections)}
+
+    def close(self):
+        self._session.close()
+
+
+class _SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: while a call for a key is
+    in flight, other callers for that key wait for it and share its result
+    (or exception) instead of making the call again.
+
+    Calls can have a priority class. A caller joining a call with a more
+    urgent priority promotes it to that priority (and calls `on_promote`),
+    so a live request never waits behind a background refresh's place in
+    the rate limiter queue.
+
+    Parameters
+    ----------
+    on_promote : callable
+        Called without arguments after a call in flight was promoted
+
+    Attributes
+    ----------
+    coalesced: Number of calls that were served by another caller's call
+    """
+    def __init__(self, on_promote=None):
+        self.coalesced = 0
+        self._on_promote = on_promote
+        self._calls = {}  # key -> (Future, _Priority or None) of the call in flight
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, priority=None):
+        """
+        Return `func(*args)`, sharing the call with concurrent callers for `key`.
+        With a `priority`, the call is made as `func(*args, shared_priority)`,
+        where `shared_priority` is a `_Priority` that joining callers may promote.
+        """
+        promoted = False
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = (Future(), None if priority is None else _Priority(priority))
+            else:
+                self.coalesced += 1
+                shared = flight[1]
+                if shared is not None and priority is not None and priority < shared.value:
+                    shared.value = priority
+                    promoted = True
+        future, shared = flight
+
+        if not leader:
+            if promoted and self._on_promote is not None:
+                self._on_promote()
+            return future.result()
+
+        try:
+            result = func(*args) if shared is None else func(*args, shared)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class _TimeSeriesCache:
+    """
+    Small thread-safe LRU cache with a time-to-live. Used to share the
+    cumulative history of a (country, status) pair between the live info
+    and the plotting code paths, so the same series isn't fetched twice.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of entries held. The least recently used entry is
+        evicted once this is exceeded.
+    ttl : float
+        Number of seconds an entry stays valid after it is stored.
+    """
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, fetched_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for `key` or None if missing/expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at < time.monotonic():
+                # Kept (until LRU-evicted) as the base of an incremental update
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def peek(self, key):
+        """Return the value for `key` even if it has expired, or None if missing."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[1]
+
+    def fetched_at(self, key):
+        """`time.time()` at which the value for `key` was fetched, or None if missing."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[2]
+
+    def put(self, key, value, ttl=None, fetched_at=None):
+        """
+        Store `value`, valid for `ttl` seconds (defaults to `self.ttl`).
+        `fetched_at` is the `time.time()` at which it was fetched upstream,
+        now by default.
+        """
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, fetched_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _Snapshot:
+    """
+    Latest totals for every country, from one call to the `/summary` 
+    endpoint, indexed by country code.
+
+    Parameters
+    ----------
+    payload : dict
+        Decoded `/summary` response
+    fetched_at : float
+        `time.time()` at which the payload was fetched (wall clock time, so
+        it can be compared with the snapshots of other processes)
+
+    Attributes
+    ----------
+    countries: A dictionary mapping a country code to a dictionary with the
+        "confirmed", "recovered", "deaths" totals, the "new_confirmed", 
+        "new_recovered", "new_deaths" counts of the last day, the "date"
+        (datetime.date) of the figures and the country's "name"
+    date: Latest date of the figures (datetime.date) or None if empty
+    ranking: `ranking.RankingIndex` of the countries by each of the figures
+    """
+    _FIELDS = {"confirmed": "TotalConfirmed", "recovered": "TotalRecovered", "deaths": "TotalDeaths",
+               "new_confirmed": "NewConfirmed", "new_recovered": "NewRecovered", "new_deaths": "NewDeaths"}
+
+    def __init__(self, payload, fetched_at):
+        self.fetched_at = fetched_at
+        self.countries = {}
+        for row in payload.get('Countries', []):
+            info = {field: row[key] for field, key in self._FIELDS.items()}
+            info["date"] = date.fromisoformat(row['Date'][:10])
+            info["name"] = row.get('Country') or row['Slug']
+            self.countries[row['Slug']] = info
+        self.date = max((info["date"] for info in self.countries.values()), default=None)
+        self.ranking = RankingIndex(self.countries, self._FIELDS)
+
+    def get(self, country, status):
+        """Return (cases, date) for the country and status, or None if unknown."""
+        info = self.countries.get(country)
+        if info is None:
+            return None
+        return info[status], info["date"]
+
+    def __len__(self):
+        return len(self.countries)
+
+
+class _PlotCache:
+    """
+    Thread-safe LRU cache of rendered plots (PNG bytes), bounded by the 
+    total size of the images held.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Once the images held take more than this many bytes, the least 
+        recently used ones are evicted.
+    """
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> png bytes
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._entries[key] = png
+            self.nbytes += len(png)
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class COVIDInfoApi:
     """
     Class for fetching live and historical information about COVID-19
@@ -30,66 +565,526 @@ class COVIDInfoApi:
 
     Attributes
     ----------
-    country_slug: A dictionary with with values that represent the country
-        code that are compatible with the API call. Keys of the dictionary
-        represent commonly used ways of referring to the country
+    country_slug: A `utils.CountryIndex` (read-only mapping) with values that 
+        represent the country code that are compatible with the API call. Keys
+        represent commonly used ways of referring to the country, in any case
 
             self.country_slug["us"] == "united-states" # True
-            self.country_slug["united states"] = "united-states" # True
+            self.country_slug["United States"] == "united-states" # True
             self.country_slug["usa"] == "united-states" # True
             self.country_slug["france"] == "france" # True
+
+    Cumulative histories fetched from the API are kept in a per-(country, status)
+    LRU cache for `cache_ttl` seconds, so repeated questions (and a plot that
+    follows a live count) don't hit the network again. Several histories can be
+    fetched concurrently with `get_series_batch`, using at most `fetch_workers`
+    threads.
+
+    All API calls share one keep-alive connection pool with (connect, read)
+    `timeout` seconds and up to `max_retries` jittered retries on 429/5xx,
+    so a hung upstream can't block a reply indefinitely. Retry and connection
+    reuse counters are available from `http_stats()`.
+
+    Rendered plots are cached (up to `plot_cache_bytes` of PNG data) by the
+    sorted countries, status, log scale and the version of every series they 
+    show, so a repeated plot is only re-rendered once upstream has new data.
+    Plots are rendered with the object-oriented matplotlib API, either on the
+    calling thread (`render_mode="thread"`) or on a pool of `render_workers` 
+    processes (`render_mode="process"`). Timings are in `render_stats()`.
+    matplotlib is only imported when the first plot is drawn (or on 
+    `preload_plotting`), so processes that only answer text start faster.
+
+    If a `store.DataStore` is given, the country list and downloaded histories
+    are also persisted to disk. On startup the stored country list is used 
+    straight away (and refreshed from the API in the background), and stored
+    histories younger than `cache_ttl` are served without a network call.
+    The store also shares the `/summary` snapshot and rendered plots between
+    bot processes that use the same file.
+
+    Expired histories are updated incrementally: only rows from the last known
+    date onwards are requested and appended. `start_refresh_scheduler` keeps
+    the most requested histories updated ahead of time. Concurrent requests
+    for the same history share a single in-flight fetch.
+
+    Live totals come from a snapshot of the `/summary` endpoint (every country
+    in one call) that is refreshed every `snapshot_ttl` seconds (defaults to
+    `cache_ttl`). Histories are only fetched for countries missing from it.
+    Rankings of the countries (`top_countries`, `country_rank`) are served
+    from the snapshot too.
+
+    Upstream calls are limited client-side to `rate_limit` per second (bursts
+    of `rate_burst`; None disables the limit). Live lookups get tokens before
+    plot histories, which get them before background refreshes. A call that
+    can't get a token in time is served from the last known (stale) copy 
+    when there is one. Limiter counters and queue depths are in `http_stats()`.
+    Background refreshes run on their own `background_workers` threads, and a
+    request that joins a refresh in flight raises it to its own priority.
+
+    Expired data is served stale-while-revalidate: the last good copy is 
+    returned immediately and refreshed in the background, so only data that
+    was never fetched has to wait for upstream.
+
+    `api_url` is the base URL of the API, e.g. a local stand-in for benchmarks.
     """
-    def __init__(self):
-        self.country_slug = defaultdict(lambda: "")
+    # Seconds to wait before trying `/summary` again after a failure
+    SNAPSHOT_RETRY_SECONDS = 60
+    # Seconds a stale history served because of the rate limit is kept before retrying
+    STALE_RETRY_SECONDS = 60
+
+    def __init__(self, cache_ttl=3600, cache_size=256, fetch_workers=8,
+                 timeout=(3.05, 10), max_retries=3, backoff_factor=0.5,
+                 plot_cache_bytes=32 * 1024 * 1024, render_mode='thread', render_workers=None,
+                 store=None, snapshot_ttl=None, rate_limit=5, rate_burst=10,
+                 api_url='https://api.covid19api.com', background_workers=2):
+        self.api_url = api_url.rstrip('/')
+        self._limiter = _TokenBucket(rate_limit, rate_burst) if rate_limit else None
+        self._http = _HttpClient(pool_size=fetch_workers, timeout=timeout,
+                                 max_retries=max_retries, backoff_factor=backoff_factor,
+                                 limiter=self._limiter)
+        self._series_cache = _TimeSeriesCache(maxsize=cache_size, ttl=cache_ttl)
+        self._inflight = _SingleFlight(on_promote=self._limiter.wake if self._limiter is not None else None)
+        self._hot_keys = Counter()  # (country, status) -> number of requests
+        self._hot_lock = threading.Lock()
+        self._plot_cache = _PlotCache(max_bytes=plot_cache_bytes)
+        self._derived_metrics = DerivedMetricsCache(maxsize=cache_size)
+        self._snapshot = None
+        self._snapshot_ttl = snapshot_ttl or cache_ttl
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_failed_at = None
+        self._revalidating = set()  # keys with a background refresh queued or running
+        self._revalidating_lock = threading.Lock()
+        self._renderer = PlotRenderer(mode=render_mode, max_workers=render_workers)
+        self._fetch_pool = ThreadPoolExecutor(max_workers=fetch_workers,
+                                              thread_name_prefix='covid-fetch')
+        # Background refreshes get their own threads, so a burst of them
+        # never queues ahead of the fetches someone is waiting for
+        self._background_pool = ThreadPoolExecutor(max_workers=background_workers,
+                                                   thread_name_prefix='covid-refresh')
+        self._store = store
+        self.country_slug = CountryIndex([])
+
+        stored_countries = store.load_countries() if store is not None else []
+        if stored_countries:
+            # Start with the stored list right away and update it in the background
+            self._set_countries(stored_countries)
+            threading.Thread(target=self.refresh_countries, name='covid-countries',
+                             daemon=True).start()
+        else:
+            self._set_countries([])
+            self.refresh_countries(priority=PRIORITY_LIVE)
 
+    def refresh_countries(self, priority=PRIORITY_BACKGROUND):
+        """
+        Fetch the list of countries from the API and update `country_slug`
+        (and the store, if any). On failure the current names are kept.
+        """
         try:
-            r = requests.get('https://api.covid19api.com/countries')
+            r = self._http.get(self.api_url + '/countries', priority)
+            if r.status_code != 200:
+                logger.error("Could not fetch the list of countries: {} {}".format(r.status_code, r.reason))
+                return
+            countries = [(country['Country'], country['Slug']) for country in r.json()[1:]]
+        except (ConnectionError, Timeout, RateLimitExceeded) as e:
+            logger.error(e)
+            return
+
+        if self._store is not None:
+            self._store.save_countries(countries)
+        self._set_countries(countries)
+
+    def _set_countries(self, countries):
+        """
+        Replace `country_slug` with an index of the (name, country code) pairs
+        plus `COUNTRY_ALIASES`. Readers pick up the new index on their next
+        lookup, as it is replaced whole.
+        """
+        self.country_slug = CountryIndex(itertools.chain(countries, COUNTRY_ALIASES.items()))
+
+
+    def http_stats(self):
+        """
+        Counters for the upstream HTTP client.
+
+        Returns
+        -------
+        dict: Request/retry/failure counters merged with the connection pool
+            reuse counters (see `_HttpClient.pool_stats`) and the number of 
+            series requests that shared an in-flight fetch ("coalesced")
+        """
+        stats = dict(self._http.stats)
+        stats.update(self._http.pool_stats())
+        stats["coalesced"] = self._inflight.coalesced
+        if self._limiter is not None:
+            stats.update(("limiter_" + name, value) for name, value in self._limiter.stats.items())
+            stats["limiter_queue_depths"] = self._limiter.queue_depths()
+        return stats
+
+    def get_snapshot(self, force=False, priority=PRIORITY_LIVE):
+        """
+        Get the snapshot of the latest totals for every country. A snapshot 
+        older than `snapshot_ttl` is still returned right away, and refreshed
+        in the background. Only the very first call (or `force`) waits for 
+        `/summary`; concurrent callers wait for one shared fetch.
+
+        With a store, a refresh uses the copy another process saved instead
+        of calling upstream, if that copy is newer than the snapshot being
+        refreshed. `force` always calls upstream.
+
+        Returns
+        -------
+        _Snapshot or None: None if no snapshot could be fetched so far. If a
+            refresh fails, the previous snapshot is returned and no new attempt
+            is made for `SNAPSHOT_RETRY_SECONDS`.
+        """
+        snapshot = self._snapshot
+        if force:
+            return self.__refresh_snapshot(priority, self.__fetched_at(snapshot), use_store=False)
+
+        failed_at = self._snapshot_failed_at
+        if (failed_at is not None and time.monotonic() - failed_at < self.SNAPSHOT_RETRY_SECONDS) or \
+                (snapshot is not None and time.time() - snapshot.fetched_at < self._snapshot_ttl):
+            metrics.inc("covidbot_cache_requests_total", cache="snapshot", result="hit")
+            return snapshot
+        if snapshot is not None:
+            metrics.inc("covidbot_cache_requests_total", cache="snapshot", result="stale")
+            # Stale while revalidate: answer from the old snapshot right away
+            self._revalidate('summary', self.__refresh_snapshot, PRIORITY_BACKGROUND, snapshot.fetched_at)
+            return snapshot
+        metrics.inc("covidbot_cache_requests_total", cache="snapshot", result="miss")
+        return self.__refresh_snapshot(priority, self.__fetched_at(snapshot))
+
+    @staticmethod
+    def __fetched_at(snapshot):
+        return snapshot.fetched_at if snapshot is not None else 0.0
+
+    def __refresh_snapshot(self, priority, replaces, use_store=True):
+        """
+        Replace a snapshot fetched at `replaces` (`time.time()`, 0 for none):
+        with a newer stored copy if there is one (and `use_store`), else 
+        from `/summary`.
+        """
+        with self._snapshot_lock:
+            # Another thread may have refreshed it while we waited for the lock
+            if self.__fetched_at(self._snapshot) > replaces:
+                return self._snapshot
+            # ... or another process, if the store is shared
+            stored = self.__load_stored_snapshot(replaces) if use_store else None
+            if stored is not None:
+                self._snapshot = stored
+                self._snapshot_failed_at = None
+                return self._snapshot
+            try:
+                r = self._http.get(self.api_url + '/summary', priority)
+                if r.status_code == 200:
+                    payload = r.json()
+                    fetched_at = time.time()
+                    self._snapshot = _Snapshot(payload, fetched_at)
+                    self._snapshot_failed_at = None
+                    if self._store is not None:
+                        self._store.save_snapshot(payload, fetched_at)
+                    return self._snapshot
+                logger.error("Could not fetch the summary: {} {}".format(r.status_code, r.reason))
+            except (ConnectionError, Timeout, RateLimitExceeded) as e:
+                logger.error(e)
+            self._snapshot_failed_at = time.monotonic()
+            return self._snapshot
+
+    def __load_stored_snapshot(self, newer_than):
+        """
+        Snapshot from the store if it was fetched after `newer_than` (`time.time()`)
+        and is younger than `snapshot_ttl`, else None.
+        """
+        if self._store is None:
+            return None
+        stored = self._store.load_snapshot()
+        if stored is None:
+            return None
+        payload, fetched_at = stored
+        if fetched_at <= newer_than or time.time() - fetched_at >= self._snapshot_ttl:
+            return None
+        return _Snapshot(payload, fetched_at)
+
+    def _revalidate(self, key, func, *args):
+        """
+        Run `func(*args)` on the background pool to refresh stale data, unless
+        a refresh for `key` is already queued or running.
+        """
+        with self._revalidating_lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                func(*args)
+            except (ConnectionError, Timeout, UpstreamError) as e:
+                logger.error("Background refresh of {} failed: {}".format(key, e))
+            except Exception:
+                # Anything else is a bug. Nobody reads the future, so it must
+                # be logged here or it goes unnoticed while stale data is served.
+                logger.exception("Background refresh of {} failed".format(key))
+            finally:
+                with self._revalidating_lock:
+                    self._revalidating.discard(key)
+
+        self._background_pool.submit(run)
+
+    def prefetch_live_info(self, pairs):
+        """
+        Make sure `get_live_country_info` can answer for every (country, status)
+        pair without further network calls: refresh the snapshot if needed and
+        fetch (concurrently) the histories of the countries missing from it.
+
+        Parameters
+        ----------
+        pairs : [(str, str)]
+            List of (country, status) tuples
+        """
+        snapshot = self.get_snapshot()
+        missing = [(country, status) for country, status in pairs
+                   if snapshot is None or snapshot.get(country, status) is None]
+        if missing:
+            self.get_series_batch(missing)
+
+    def _load_series(self, country, status, priority=PRIORITY_LIVE):
+        """
+        Get the cumulative history for a single (country, status) pair, 
+        served from the cache when possible.
+
+        Parameters
+        ----------
+        country : str
+            country code that is compatible with the API call.
+        status : str
+            one of "confirmed", "recovered", "deaths"
+        priority : int
+            Rate limiter class of the upstream calls, if any are needed
+
+        Returns
+        -------
+        series.CountrySeries: Array-backed cumulative history
+
+        Raises
+        ------
+        ConnectionError, Timeout, UpstreamError
+        """
+        key = (country, status)
+        with self._hot_lock:
+            self._hot_keys[key] += 1
+
+        series = self._series_cache.get(key)
+        if series is not None:
+            metrics.inc("covidbot_cache_requests_total", cache="series", result="hit")
+            return series
+
+        # Stale while revalidate: serve the expired copy now, update it in the background
+        stale = self._series_cache.peek(key)
+        if stale is not None:
+            metrics.inc("covidbot_cache_requests_total", cache="series", result="stale")
+            self._revalidate(key, self.refresh_series, country, status)
+            return stale
+
+        metrics.inc("covidbot_cache_requests_total", cache="series", result="miss")
+        # Concurrent requests for the same pair share one fetch
+        return self._inflight.do(key, self.__load_uncached, country, status, priority=priority)
+
+    def __load_uncached(self, country, status, priority):
+        key = (country, status)
+        # A fetch for this pair may have finished just before we got here
+        series = self._series_cache.get(key)
+        if series is not None:
+            return series
+
+        if self._store is not None:
+            stored = self._store.load_series(country, status)
+            if stored is not None:
+                metrics.inc("covidbot_cache_requests_total", cache="store", result="hit")
+                series, fetched_at = stored
+                age = time.time() - fetched_at
+                if age < self._series_cache.ttl:
+                    self._series_cache.put(key, series, ttl=self._series_cache.ttl - age, fetched_at=fetched_at)
+                else:
+                    # Serve the stored copy now, update it in the background
+                    self._series_cache.put(key, series, ttl=0, fetched_at=fetched_at)
+                    self._revalidate(key, self.refresh_series, country, status)
+                return series
+
+        return self._fetch_series(country, status, None, priority)
+
+    def _fetch_series(self, country, status, base=None, priority=PRIORITY_LIVE):
+        """
+        Fetch the history of a (country, status) pair from the API and update
+        the cache and store. If an older copy (`base`) is available, only the
+        rows from its last date onwards are requested and appended to it, and
+        it is returned as is if the rate limiter has no budget left.
+
+        Raises
+        ------
+        ConnectionError, Timeout, UpstreamError
+        """
+        try:
+            return self.__fetch_series(country, status, base, priority)
+        except RateLimitExceeded as e:
+            if base is None or not len(base):
+                raise
+            logger.warning("{}, serving cached {}/{} as of {}".format(e, country, status, base.last_date))
+            # Try again in a little while rather than on every request
+            key = (country, status)
+            self._series_cache.put(key, base, ttl=self.STALE_RETRY_SECONDS,
+                                   fetched_at=self._series_cache.fetched_at(key))
+            return base
+
+    def __fetch_series(self, country, status, base, priority):
+        url = self.api_url + '/total/country/' + country + '/status/' + status
+        series = None
+
+        if base is not None and len(base):
+            r = self._http.get(url + '?from={}T00:00:00Z&to={}T00:00:00Z'.format(
+                                base.last_date, date.today() + timedelta(days=1)), priority)
             if r.status_code == 200:
-                for country in r.json()[1:]:
-                    self.country_slug[country['Country']] = country['Slug']
-                self.country_slug = CaseAgnosticDict(self.country_slug)
-
-            # Hard-coding (alternate) country names
-            self.country_slug['congo b'] = 'congo-brazzaville'
-            self.country_slug['congo brazzaville'] = 'congo-brazaville'
-            self.country_slug['palestine'] = 'palestine'
-            self.country_slug['palestinian'] = 'palestine'
-            self.country_slug['sao tome'] = 'sao-tome-and-principe'
-            self.country_slug['british indian ocean'] = 'british-indian-ocean-territory'
-            self.country_slug['uae']  = 'united-arab-emirates'
-            self.country_slug['falkland islands malvinas'] = 'falkland-islands-malvinas'
-            #self.country_slug['saint martin french part'] = 'saint-martin-french-part'
-            #self.country_slug['saint martin french'] = 'saint-martin-french-part'
-            self.country_slug['holy see vatican city state'] = 'holy-see-vatican-city-state'
-            self.country_slug['vatican city'] = 'holy-see-vatican-city-state'
-            self.country_slug['vatican'] = 'holy-see-vatican-city-state'
-            self.country_slug['cote divoire'] = 'cote-divoire'
-            self.country_slug['iran'] = 'iran'
-            self.country_slug['macedonia'] = 'macedonia'
-            self.country_slug['cocos keeling islands'] = 'cocos-keeling-islands'
-            self.country_slug['uk'] = 'united-kingdom'
-            self.country_slug['congo kinshasa'] = 'congo-kinshasa'
-            self.country_slug['congo k'] = 'congo-kinshasa'
-            self.country_slug['united states'] = 'united-states'
-            self.country_slug['us'] = 'united-states'
-            self.country_slug['usa'] = 'united-states'
-            self.country_slug['guinea bissau'] = 'guinea-bissau'
-            self.country_slug['syria'] = 'syria'
-            #self.country_slug['north korea'] = 'korea-north'
-            self.country_slug['venezuela'] = 'venezuela'
-            self.country_slug['timor leste'] = 'timor-leste'
-            self.country_slug['south korea'] = 'korea-south'
-            self.country_slug['vietnam'] = 'vietnam'
-            self.country_slug['us virgin islands'] = 'virgin-islands'
-            self.country_slug['macao'] = 'macao-sar-china'
-            self.country_slug['hong kong'] = 'hong-kong-sar-china'
-            self.country_slug['hk'] = 'hong-kong-sar-china'
-            self.country_slug['saint-barthelemy'] = 'saint-barthélemy'
-            self.country_slug['barthelemy'] = 'saint-barthélemy'
-            self.country_slug['micronesia'] = 'micronesia'
-
-        except ConnectionError as e:
+                series = merge_series(base, parse_series(r.json()))
+            else:
+                logger.warning("Incremental update failed for {}/{} ({}), fetching full history".format(
+                               country, status, r.status_code))
+
+        if series is None:
+            r = self._http.get(url, priority)
+            if r.status_code != 200:
+                raise UpstreamError("{} {} for {}/{}".format(r.status_code, r.reason, country, status))
+            # Decode once and keep only the compact arrays around
+            series = parse_series(r.json())
+
+        fetched_at = time.time()
+        self._series_cache.put((country, status), series, fetched_at=fetched_at)
+        if self._store is not None:
+            self._store.save_series(country, status, series, fetched_at)
+        return series
+
+    def refresh_series(self, country, status, priority=PRIORITY_BACKGROUND):
+        """
+        Update the history of a (country, status) pair now, even if the 
+        cached copy has not expired yet. Uses an incremental update when a
+        copy is available. If another process sharing the store fetched the
+        pair after our copy was fetched, its copy is used instead, without
+        a network call while it is younger than the cache TTL.
+
+        Raises
+        ------
+        ConnectionError, Timeout, UpstreamError
+        """
+        return self._inflight.do((country, status), self.__refresh_uncached, country, status, priority=priority)
+
+    def __refresh_uncached(self, country, status, priority):
+        key = (country, status)
+        base = self._series_cache.peek(key)
+        stored = self._store.load_series(country, status) if self._store is not None else None
+        if stored is not None:
+            series, fetched_at = stored
+            if base is None or fetched_at > self._series_cache.fetched_at(key):
+                age = time.time() - fetched_at
+                if age < self._series_cache.ttl:
+                    metrics.inc("covidbot_cache_requests_total", cache="store", result="hit")
+                    self._series_cache.put(key, series, ttl=self._series_cache.ttl - age, fetched_at=fetched_at)
+                    return series
+                base = series
+        return self._fetch_series(country, status, base, priority)
+
+    def start_refresh_scheduler(self, interval=None, top_n=20):
+        """
+        Start a background thread that refreshes the live totals snapshot 
+        and the most requested series every `interval` seconds (defaults to
+        90% of the cache TTL), so they are up to date before anyone asks.
+        Request counts are halved after every round, so the set of hot 
+        series follows recent traffic. Refreshes use the background priority.
+        Processes sharing a store should only run one scheduler between them:
+        the others pick the refreshed data up from the store.
+
+        Parameters
+        ----------
+        interval : float
+            Seconds between two refresh rounds
+        top_n : int
+            Number of (country, status) pairs refreshed per round
+        """
+        interval = interval or 0.9 * self._series_cache.ttl
+
+        def refresh():
+            self.get_snapshot(force=True, priority=PRIORITY_BACKGROUND)
+            with self._hot_lock:
+                hot_keys = [key for key, _ in self._hot_keys.most_common(top_n)]
+                self._hot_keys = Counter({key: count // 2 
+                                          for key, count in self._hot_keys.items() if count > 1})
+            futures = [self._background_pool.submit(self.refresh_series, *key) for key in hot_keys]
+            for key, future in zip(hot_keys, futures):
+                try:
+                    future.result()
+                except (ConnectionError, Timeout, UpstreamError) as e:
+                    logger.error("Scheduled refresh of {}/{} failed: {}".format(key[0], key[1], e))
+                except Exception:
+                    logger.exception("Scheduled refresh of {}/{} failed".format(key[0], key[1]))
+
+        def run():
+            while True:
+                time.sleep(interval)
+                # Anything going wrong in one round (a bad payload, the store)
+                # must not stop the refreshes for the life of the process
+                try:
+                    refresh()
+                except Exception:
+                    logger.exception("Scheduled refresh round failed")
+
+        thread = threading.Thread(target=run, name='covid-refresh', daemon=True)
+        thread.start()
+        return thread
+
+    def _get_series(self, country, status, priority=PRIORITY_LIVE):
+        """
+        Same as `_load_series` but logs failures and returns None instead 
+        of raising.
+        """
+        try:
+            return self._load_series(country, status, priority)
+        except (ConnectionError, Timeout, UpstreamError) as e:
+            logger.error(e)
+
+    def get_series_batch(self, pairs, priority=PRIORITY_LIVE):
+        """
+        Fetch the cumulative history for several (country, status) pairs 
+        concurrently. Duplicate pairs are only fetched once and cached
+        pairs are not fetched at all.
+
+        Parameters
+        ----------
+        pairs : [(str, str)]
+            List of (country, status) tuples. country is a country code 
+            compatible with the API call and status is one of "confirmed",
+            "recovered", "deaths"
+        priority : int
+            Rate limiter class of the upstream calls, if any are needed
+
+        Returns
+        -------
+        [(series.CountrySeries or None, Exception or None)]: One (series, error)
+            tuple per pair, in the same order as `pairs`. Exactly one of the two is None.
+        """
+        unique_pairs = list(OrderedDict.fromkeys(pairs))
+        if len(unique_pairs) <= 1:
+            outcomes = [self.__outcome(self._load_series, pair, priority) for pair in unique_pairs]
+        else:
+            futures = [self._fetch_pool.submit(self.__outcome, self._load_series, pair, priority)
+                       for pair in unique_pairs]
+            outcomes = [future.result() for future in futures]
+
+        results = dict(zip(unique_pairs, outcomes))
+        return [results[pair] for pair in pairs]
+
+    @staticmethod
+    def __outcome(func, pair, priority):
+        try:
+            return func(*pair, priority=priority), None
+        except (ConnectionError, Timeout, UpstreamError) as e:
             logger.error(e)
+            return None, e
     
 
     def get_live_country_info(self, country, status):
@@ -108,32 +1103,115 @@ class COVIDInfoApi:
         Returns
         -------
         (str): Latest information about the number of cases for the country 
-            according to the `status`   
-        
-        Raises
-        ------
-        ConnectionError
+            according to the `status`, with the date the figure is for. If 
+            upstream is slow or down, the last known figure is used; if there
+            is none, an apology is returned instead.
         """        
 
-        try:
-            r = requests.get('https://api.covid19api.com/total/country/' + country + '/status/' + status)
-            if r.status_code == 200:
-                info = json.loads(r.text)[-1]
-                if status == 'deaths':
-                    live_status = "Total number of {} in {} as of {} is {}\n".format(status,
-                                                                                     country.upper(),
-                                                                                     str(date.today()),
-                                                                                     str(info['Cases']))
-                else:
-                    live_status = "Total number of {} cases in {} as of {} is {}\n".format(status,
-                                                                                           country.upper(),
-                                                                                           str(date.today()),
-                                                                                           str(info['Cases']))
-                return live_status
-        except ConnectionError as e:
-            logger.error(e)
+        # Served from the shared snapshot. Only countries missing from it 
+        # need their own history.
+        latest = None
+        snapshot = self.get_snapshot()
+        if snapshot is not None and snapshot.get(country, status) is not None:
+            latest, as_of = snapshot.get(country, status)
+        else:
+            series = self._get_series(country, status)
+            if series:
+                latest, as_of = series.latest, series.last_date
+
+        if latest is None:
+            # Degraded reply: nothing cached and upstream is unavailable
+            return "Sorry, I couldn't get the number of {} in {} right now. Please try again later.\n".format(
+                   status, country.upper())
+
+        if status == 'deaths':
+            live_status = "Total number of {} in {} as of {} is {}\n".format(status,
+                                                                             country.upper(),
+                                                                             str(as_of),
+                                                                             str(latest))
+        else:
+            live_status = "Total number of {} cases in {} as of {} is {}\n".format(status,
+                                                                                   country.upper(),
+                                                                                   str(as_of),
+                                                                                   str(latest))
+        return live_status
+
+    def get_derived_metrics(self, countries, status):
+        """
+        Daily new cases, 7 and 14 day averages, growth rate and doubling time
+        of the countries (see `derived_metrics.compute_metrics`), computed 
+        together from their histories and cached until the data changes.
+
+        Parameters
+        ----------
+        countries : [str]
+            Country codes that are compatible with the API call
+        status : str
+            one of "confirmed", "recovered", "deaths"
+
+        Returns
+        -------
+        dict: Country code -> dictionary of metrics, or None when the
+            history of the country isn't available
+        """
+        pairs = [(country, status) for country in countries]
+        outcomes = self.get_series_batch(pairs)
+        keyed_series = [(pair, series) for pair, (series, _) in zip(pairs, outcomes)
+                        if series is not None and len(series)]
+        result = dict.fromkeys(countries)
+        for ((country, _), _), row in zip(keyed_series, self._derived_metrics.get_many(keyed_series)):
+            result[country] = row
+        return result
+
+    def top_countries(self, status, n=10):
+        """
+        The countries with the most cases, from the latest snapshot.
+
+        Parameters
+        ----------
+        status : str
+            one of "confirmed", "recovered", "deaths", or "new_confirmed",
+            "new_recovered", "new_deaths" for the cases of the last day
+        n : int
+            Number of countries
+
+        Returns
+        -------
+        ([(str, int)], datetime.date) or None: (slug, cases) pairs by 
+            decreasing number of cases and the date of the figures. None if
+            no snapshot is available. Slugs are the country codes of the API
+            calls, see `country_name` for display names.
+        """
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        return snapshot.ranking.top(status, n), snapshot.date
+
+    def country_rank(self, country, status):
+        """
+        Where a country ranks by number of cases, from the latest snapshot.
+        Same `status` values as `top_countries`.
+
+        Returns
+        -------
+        (int, int, int) or None: Rank (1 for the most cases), number of 
+            countries ranked and cases of the country. None if the country
+            or the snapshot isn't available.
+        """
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        return snapshot.ranking.rank(country, status)
+
+    def country_name(self, country):
+        """
+        Display name of a country code ("United States of America" for 
+        "united-states"), from the latest snapshot, or None if unknown.
+        """
+        snapshot = self.get_snapshot()
+        info = snapshot.countries.get(country) if snapshot is not None else None
+        return info["name"] if info is not None else None
 
-   
     def __get_country_cumulative_info(self, countries, status):
         """
         Internal helper method that gets the cumulative history of the 
@@ -152,7 +1230,9 @@ class COVIDInfoApi:
         Returns
         -------
         cases, dates: (List, List)
-            Cumulative history with number of cases for every recorded date
+            Cumulative history with number of cases for every recorded date, 
+            as int64 and datetime64[D] numpy arrays, one per country in the
+            order of `countries`. None for a history that could not be fetched.
 
         Raises
         ------
@@ -173,26 +1253,23 @@ class COVIDInfoApi:
             else:
                 status_index = [2]
         
-        # Fetch cumulative history
-        try:
-            for i in range(len(status_list)):
-                for country in countries:
-                    r = requests.get(
-                        'https://api.covid19api.com/total/country/' + country + '/status/' + status_list[i])
-                    
-                    if r.status_code == 200:
-                        cases[status_index[i]].append([day_info['Cases'] 
-                                                    for day_info in r.json()])
-
-                        dates[status_index[i]].append([date.fromisoformat(day_info['Date'].split('T')[0]) 
-                                                    for day_info in r.json()])
-            if status == 'all':
-                return cases, dates
-            else:
-                return cases[status_index[0]], dates[status_index[0]]
-        
-        except ConnectionError as e:
-            logger.error(e)
+        # Fetch cumulative history for every (status, country) pair in one
+        # concurrent batch. Payloads are shared with `get_live_country_info`
+        # through the series cache.
+        pairs = [(country, _status) for _status in status_list for country in countries]
+        outcomes = iter(self.get_series_batch(pairs, priority=PRIORITY_PLOT))
+        for i in range(len(status_list)):
+            for country in countries:
+                series, _ = next(outcomes)
+
+                # Keep the slot of a failed fetch, so the remaining series 
+                # stay paired with their country
+                cases[status_index[i]].append(series.cases if series is not None else None)
+                dates[status_index[i]].append(series.dates if series is not None else None)
+        if status == 'all':
+            return cases, dates
+        else:
+            return cases[status_index[0]], dates[status_index[0]]
 
 
     def compare_country_plot(self, countries, status, log_scale=False):
@@ -216,61 +1293,121 @@ class COVIDInfoApi:
         matplotlib.figure.Figure
         """
         cases, dates = self.__get_country_cumulative_info(countries, status)
+        return build_comparison_figure(countries, status, cases, dates, log_scale=log_scale)
 
-        # Plotting
-        num_countries = len(countries)
-        subplots = math.ceil(num_countries / 3)
-        grid_x = math.ceil(subplots / 3)
-        if (subplots <= 2):
-            grid_y = subplots
-        else:
-            grid_y = 3
-
-        fig, axs = plt.subplots(grid_x, grid_y, squeeze=False, 
-                               figsize=(14, 12), linewidth=1)
-        for i in range(grid_x):
-            for j in range(grid_y):
-                if (status != 'all'):
-                    if (9 * i + 3 * j < num_countries):
-                        axs[i, j].plot(dates[9 * i + 3 * j],
-                                       cases[9 * i + 3 * j],
-                                       label=countries[9 * i + 3 * j].upper()+' ('+status+')')
-                    if (9 * i + 3 * j + 1 < num_countries):
-                        axs[i, j].plot(dates[9 * i + 3 * j + 1],
-                                       cases[9 * i + 3 * j + 1],
-                                       label=countries[9 * i + 3 * j + 1].upper()+' ('+status+')')
-                    if (9 * i + 3 * j + 2 < num_countries):
-                        axs[i, j].plot(dates[9 * i + 3 * j + 2],
-                                       cases[9 * i + 3 * j + 2],
-                                       label=countries[9 * i + 3 * j + 2].upper()+' ('+status+')')
-                else:
-                    status_list = ['confirmed','recovered','deaths']
-                    if (9 * i + 3 * j < num_countries):
-                        for a in range(len(status_list)):
-                            axs[i, j].plot(dates[a][9 * i + 3 * j],
-                                           cases[a][9 * i + 3 * j],
-                                           marker='+',
-                                           linewidth=2,
-                                           label=countries[9 * i + 3 * j].upper()+' ('+status_list[a]+')',
-                                           )
-                    if (9 * i + 3 * j + 1 < num_countries):
-                        for a in range(len(status_list)):
-                            axs[i, j].plot(dates[a][9 * i + 3 * j + 1],
-                                           cases[a][9 * i + 3 * j + 1],
-                                           'o',
-                                           label=countries[9 * i + 3 * j + 1].upper()+' ('+status_list[a]+')')
-                    if (9 * i + 3 * j + 2 < num_countries):
-                        for a in range(len(status_list)):
-                            axs[i, j].plot(dates[a][9 * i + 3 * j + 2],
-                                           cases[a][9 * i + 3 * j + 2],
-                                           linewidth=2,
-                                           label=countries[9 * i + 3 * j + 2].upper()+' ('+status_list[a]+')')
-
-                axs[i, j].legend()
-                if log_scale:
-                    axs[i, j].set_yscale("log")
-
-        fig.suptitle("Number of COVID-19 cases")
-        fig.autofmt_xdate()
-        plt.tight_layout(rect=[0, 0.03, 1, 0.95])
-        return plt.gcf()
\ No newline at end of file
+    def render_country_plot(self, countries, status, log_scale=False, keep_order=False):
+        """
+        Same as `compare_country_plot` but renders the figure straight into
+        an in-memory PNG, so no disk I/O is involved.
+
+        Countries are plotted in sorted order (or in the given order, with
+        `keep_order`) and the image is cached until any of the series it 
+        shows gets new or revised rows, so asking for the same plot again 
+        (in any country order) doesn't re-render it. Plots missing a series
+        are not cached.
+
+        Parameters
+        ----------
+        countries : [str]
+            List of countries with formatted names that are consistent with API call
+        status : str
+            One of "confirmed", "recovered", "deaths", "all"
+        log_scale: bool
+            If True plots the numbers on a log scale
+        keep_order: bool
+            If True the countries (and the legend) keep their order, e.g. a
+            ranking's
+
+        Returns
+        -------
+        bytes or None: PNG image. None if the render timed out or kept killing
+            render processes.
+        """
+        countries = list(OrderedDict.fromkeys(countries)) if keep_order else sorted(set(countries))
+        status_list = ['confirmed', 'recovered', 'deaths'] if status == 'all' else [status]
+
+        # The series are needed for the plot anyway; here they're (mostly) 
+        # cache hits that tell us which version of the data would be shown.
+        outcomes = self.get_series_batch([(country, _status) for _status in status_list
+                                                             for country in countries],
+                                         priority=PRIORITY_PLOT)
+        complete = all(series is not None for series, _ in outcomes)
+        if complete:
+            data_version = tuple(series.version for series, _ in outcomes)
+            key = (tuple(countries), status, bool(log_scale), data_version)
+            png = self._plot_cache.get(key)
+            if png is not None:
+                metrics.inc("covidbot_cache_requests_total", cache="plot", result="hit")
+                return png
+
+            # Another process sharing the store may have rendered it already
+            store_key = "{}|{}|{}|{}".format(",".join(countries), status, int(bool(log_scale)),
+                                             hashlib.sha1(repr(data_version).encode()).hexdigest())
+            if self._store is not None:
+                png = self._store.load_plot(store_key)
+                if png is not None:
+                    metrics.inc("covidbot_cache_requests_total", cache="plot", result="store")
+                    self._plot_cache.put(key, png)
+                    return png
+        metrics.inc("covidbot_cache_requests_total", cache="plot", result="miss")
+
+        cases, dates = self.__get_country_cumulative_info(countries, status)
+        try:
+            png = self._renderer.render(countries, status, cases, dates, log_scale=log_scale)
+        except (FutureTimeout, BrokenProcessPool) as e:
+            logger.error("Could not render the plot of {} ({}): {!r}".format(countries, status, e))
+            return None
+
+        # Don't keep plots with missing countries around
+        if complete:
+            self._plot_cache.put(key, png)
+            if self._store is not None:
+                self._store.save_plot(store_key, png, time.time(), self._plot_cache.max_bytes)
+        return png
+
+    def preload_plotting(self):
+        """
+        Load matplotlib in the background (see `plotting.PlotRenderer.preload`),
+        so the first plot request doesn't wait for the import.
+        """
+        self._renderer.preload()
+
+    def render_stats(self):
+        """
+        Plot rendering counters.
+
+        Returns
+        -------
+        dict: Render count and total/last/max render time in seconds (see
+            `plotting.PlotRenderer`), plus the number and size of cached plots
+        """
+        stats = dict(self._renderer.stats)
+        stats.update(cached_plots=len(self._plot_cache), cached_plot_bytes=self._plot_cache.nbytes)
+        return stats
+
+    # Gauge name -> key of `http_stats()` or `render_stats()`
+    _HTTP_GAUGES = {"covidbot_upstream_requests": "requests", "covidbot_upstream_retries": "retries",
+                    "covidbot_upstream_failures": "failures", "covidbot_upstream_pool_reused": "pool_reused",
+                    "covidbot_upstream_coalesced": "coalesced", "covidbot_limiter_granted": "limiter_granted",
+                    "covidbot_limiter_rejected": "limiter_rejected",
+                    "covidbot_limiter_max_queue_depth": "limiter_max_queue_depth"}
+    _RENDER_GAUGES = {"covidbot_renders": "renders", "covidbot_render_seconds_total": "total_seconds",
+                      "covidbot_render_max_seconds": "max_seconds", "covidbot_cached_plots": "cached_plots",
+                      "covidbot_cached_plot_bytes": "cached_plot_bytes"}
+
+    def register_metrics(self, registry=metrics):
+        """
+        Export `http_stats()`, `render_stats()` and the rate limiter queue 
+        depth of every priority as gauges of `registry`, read every time the
+        metrics are rendered.
+        """
+        for name, key in self._HTTP_GAUGES.items():
+            registry.register_gauge(name, lambda key=key: self.http_stats().get(key, 0))
+        for name, key in self._RENDER_GAUGES.items():
+            registry.register_gauge(name, lambda key=key: self.render_stats()[key])
+        for priority, label in ((PRIORITY_LIVE, "live"), (PRIORITY_PLOT, "plot"),
+                                (PRIORITY_BACKGROUND, "background")):
+            registry.register_gauge("covidbot_limiter_queue_depth",
+                                    lambda priority=priority: self._limiter.queue_depths().get(priority, 0)
+                                    if self._limiter is not None else 0,
+                                    priority=label)
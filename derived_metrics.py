@@ -0,0 +1,120 @@
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+# Windows (days) of the rolling averages of new cases
+AVERAGE_WINDOWS = (7, 14)
+# Growth rates are measured over this many days
+GROWTH_DAYS = 7
+
+
+def compute_metrics(series_list, windows=AVERAGE_WINDOWS, growth_days=GROWTH_DAYS):
+    """
+    Compute the derived metrics of several cumulative series at once, each
+    as of its own last date.
+
+    Every series is reindexed onto the consecutive days ending at its last
+    date (days missing upstream keep the previous cumulative count), so all
+    of them fit in one (series, days) array and every metric is a single
+    vectorized operation over it.
+
+    Parameters
+    ----------
+    series_list : [series.CountrySeries]
+        Non-empty series with dates in ascending order
+    windows : tuple of int
+        Windows in days of the rolling averages
+    growth_days : int
+        Number of days the growth rate is measured over
+
+    Returns
+    -------
+    dict of numpy.ndarray, one value per series:
+        "date": last date (datetime64[D])
+        "new": new cases on the last date
+        "avg_<window>": average new cases per day over the last `window` days
+        "growth": average daily growth rate of the cumulative count over the
+            last `growth_days` days (0.01 is 1% a day)
+        "doubling_days": days the cumulative count takes to double at that
+            rate (inf if it isn't growing)
+    """
+    span = max(max(windows), growth_days) + 1
+    offsets = np.arange(span - 1, -1, -1)
+    cumulative = np.zeros((len(series_list), span), dtype=np.int64)
+    last_dates = np.empty(len(series_list), dtype='datetime64[D]')
+    for i, series in enumerate(series_list):
+        last_dates[i] = series.dates[-1]
+        index = np.searchsorted(series.dates, last_dates[i] - offsets, side='right') - 1
+        cumulative[i] = np.where(index >= 0, series.cases[np.maximum(index, 0)], 0)
+
+    latest = cumulative[:, -1]
+    metrics = {"date": last_dates, "new": latest - cumulative[:, -2]}
+    for window in windows:
+        metrics["avg_{}".format(window)] = (latest - cumulative[:, -1 - window]) / window
+
+    before = cumulative[:, -1 - growth_days]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(before > 0, (latest / before) ** (1 / growth_days) - 1, np.nan)
+        metrics["growth"] = growth
+        metrics["doubling_days"] = np.where(growth > 0, np.log(2) / np.log1p(growth), np.inf)
+    return metrics
+
+
+class DerivedMetricsCache:
+    """
+    Thread-safe LRU cache of the derived metrics of (country, status) pairs,
+    keyed by the version of the data they were computed from, so metrics are
+    only recomputed once the underlying series changed (`CountrySeries.version`
+    includes a checksum of every row, so upstream revisions of earlier days
+    are noticed too).
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of (country, status) pairs kept
+    """
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()  # key -> (data version, metrics dict)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _version(series):
+        return series.version
+
+    def get_many(self, keyed_series):
+        """
+        Parameters
+        ----------
+        keyed_series : [(hashable, series.CountrySeries)]
+            Keys (e.g. (country, status)) and their non-empty series
+
+        Returns
+        -------
+        [dict]: Metrics of each series (see `compute_metrics`, with plain
+            Python values), in the same order. Missing or outdated ones are
+            computed together in one batch.
+        """
+        results = [None] * len(keyed_series)
+        missing = []
+        with self._lock:
+            for i, (key, series) in enumerate(keyed_series):
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == self._version(series):
+                    self._entries.move_to_end(key)
+                    results[i] = entry[1]
+                else:
+                    missing.append(i)
+
+        if missing:
+            computed = compute_metrics([keyed_series[i][1] for i in missing])
+            with self._lock:
+                for row, i in enumerate(missing):
+                    key, series = keyed_series[i]
+                    results[i] = {name: values[row].item() for name, values in computed.items()}
+                    self._entries[key] = self._version(series), results[i]
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return results
@@ -0,0 +1,86 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelDispatcher:
+    """
+    Runs message handling jobs on a bounded pool of worker threads, so that
+    slow jobs (API calls, plotting, uploads) never run on the RTM event loop.
+
+    Jobs submitted for the same channel run one at a time and in submission
+    order, so replies within a channel never overtake each other. Jobs for
+    different channels run concurrently, up to `max_workers` at a time.
+    Channels take turns: after each job a busy channel goes to the back of
+    the pool's queue instead of holding on to its worker.
+
+    Parameters
+    ----------
+    max_workers : int
+        Maximum number of jobs that run at the same time
+    """
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix='covid-worker')
+        self._queues = {}  # channel -> deque of pending jobs
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, channel, func, *args, **kwargs):
+        """
+        Queue `func(*args, **kwargs)` to run after every job already
+        submitted for `channel`.
+        """
+        with self._lock:
+            queue = self._queues.get(channel)
+            if queue is not None:
+                # A drain for this channel is already scheduled or running
+                queue.append((func, args, kwargs))
+                return
+            self._queues[channel] = deque([(func, args, kwargs)])
+        self._pool.submit(self._run_next, channel)
+
+    def _run_next(self, channel):
+        with self._lock:
+            func, args, kwargs = self._queues[channel][0]
+
+        try:
+            func(*args, **kwargs)
+        except Exception:
+            logger.exception("Job for channel {} failed".format(channel))
+
+        with self._lock:
+            queue = self._queues[channel]
+            queue.popleft()
+            if not queue:
+                del self._queues[channel]
+                if not self._queues:
+                    self._idle.notify_all()
+                return
+        self._pool.submit(self._run_next, channel)
+
+    def pending(self):
+        """Number of jobs submitted but not yet finished, over all channels."""
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def join(self, timeout=None):
+        """
+        Wait until every job submitted so far has run. Returns False if
+        `timeout` seconds passed first.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._queues, timeout)
+
+    def shutdown(self, wait=True):
+        """
+        Stop the worker pool. With `wait`, every job already submitted is
+        run first.
+        """
+        if wait:
+            self.join()
+        self._pool.shutdown(wait=wait)
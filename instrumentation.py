@@ -0,0 +1,186 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import contextmanager
+import threading
+import bisect
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, num_buckets):
+        self.counts = [0] * (num_buckets + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """
+    Lightweight, thread-safe registry of counters, latency histograms and
+    gauges, rendered in the Prometheus text exposition format.
+
+    Metrics are identified by a name and keyword labels, e.g.
+
+        metrics.inc("covidbot_cache_requests_total", cache="series", result="hit")
+        with metrics.timer("covidbot_stage_seconds", stage="process"):
+            ...
+
+    Parameters
+    ----------
+    buckets : tuple of float
+        Upper bounds in seconds of the histogram buckets
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> _Histogram
+        self._gauges = {}      # (name, labels) -> callable returning a number
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        # Label values are exported as text anyway. Keeping them as strings
+        # lets keys with e.g. a status code (int) and an error name sort together.
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            histogram.counts[index] += 1
+            histogram.sum += seconds
+            histogram.count += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Context manager that observes the time spent in its block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def register_gauge(self, name, func, **labels):
+        """Report `func()` as the value of the gauge every time metrics are rendered."""
+        with self._lock:
+            self._gauges[self._key(name, labels)] = func
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _format_labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join('{}="{}"'.format(k, str(v).replace('"', '\\"')) for k, v in pairs) + "}"
+
+    def render(self):
+        """
+        Returns
+        -------
+        str: Every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum, h.count))
+                                for key, h in self._histograms.items())
+            gauges = sorted(self._gauges.items(), key=lambda item: item[0])
+
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append("# TYPE {} {}".format(name, kind))
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append("{}{} {}".format(name, self._format_labels(labels), value))
+
+        for (name, labels), (counts, total, count) in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append("{}_bucket{} {}".format(
+                    name, self._format_labels(labels, [("le", bound)]), cumulative))
+            lines.append("{}_sum{} {}".format(name, self._format_labels(labels), total))
+            lines.append("{}_count{} {}".format(name, self._format_labels(labels), count))
+
+        for (name, labels), func in gauges:
+            try:
+                value = func()
+            except Exception:
+                logger.exception("Gauge {} failed".format(name))
+                continue
+            declare(name, "gauge")
+            lines.append("{}{} {}".format(name, self._format_labels(labels), value))
+
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port, host='127.0.0.1'):
+        """
+        Serve the metrics at http://host:port/metrics from a background thread.
+
+        Returns
+        -------
+        http.server.ThreadingHTTPServer
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip('/') not in ('', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep scrapes out of the bot's log
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='covid-metrics', daemon=True).start()
+        return server
+
+    def start_periodic_dump(self, interval, log=None):
+        """Write the rendered metrics to `log` (this module's logger by default) every `interval` seconds."""
+        log = log or logger
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    log.info("Metrics\n" + self.render())
+                except Exception:
+                    logger.exception("Could not dump the metrics")
+
+        thread = threading.Thread(target=run, name='covid-metrics-dump', daemon=True)
+        thread.start()
+        return thread
+
+
+# Registry shared by the whole bot
+metrics = MetricsRegistry()
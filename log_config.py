@@ -0,0 +1,115 @@
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import logging
+import atexit
+import copy
+import random
+import queue
+import json
+
+# Attributes every LogRecord has. Anything else on a record came in
+# through `extra=` and is written out as a structured field.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line with the time, logger,
+    level and message, plus every field passed with `extra=`:
+
+        logger.info("Message received", extra={"channel": "C123"})
+    """
+    def format(self, record):
+        entry = {"time": self.formatTime(record, '%Y-%m-%d %H:%M:%S') + ",{:03d}".format(int(record.msecs)),
+                 "logger": record.name,
+                 "level": record.levelname,
+                 "message": record.getMessage()}
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES and not name.startswith('_'):
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    `QueueHandler` that keeps the traceback of a record apart from its
+    message. The stock `prepare` appends it to the message and drops 
+    `exc_info` (which can't be pickled); here it is kept as text in
+    `exc_text`, which `StructuredFormatter` writes as the "exception" field.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def configure_logging(path='../covidbot.log', level=logging.INFO,
+                      max_bytes=10 * 1024 * 1024, backup_count=5, log_queue=None):
+    """
+    Set up logging for the bot once per process. Records are put on an
+    in-memory queue by the threads that log them, and written to a
+    size-rotated file by a single background thread, so logging never
+    waits on disk I/O. Calling it again does nothing.
+
+    With several bot processes, only the supervisor writes the file: pass
+    it a `multiprocessing` queue as `log_queue`, and the worker processes
+    send their records to it with `forward_logging`.
+
+    Parameters
+    ----------
+    path : str
+        Log file
+    level : int
+        Level of the root logger
+    max_bytes : int
+        Size at which the log file is rotated
+    backup_count : int
+        Number of rotated files kept
+    log_queue : queue-like
+        Queue to read records from. Defaults to a new in-process queue.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                       encoding='utf-8')
+    file_handler.setFormatter(StructuredFormatter())
+
+    if log_queue is None:
+        log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_StructuredQueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    # Flush what's left in the queue on exit
+    atexit.register(_listener.stop)
+
+
+def forward_logging(log_queue, level=logging.INFO):
+    """
+    Send every record logged in this (worker) process to `log_queue`, to be
+    written by the process that called `configure_logging` with it.
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(_StructuredQueueHandler(log_queue))
+
+
+def sampled(rate):
+    """
+    Returns True for a random fraction `rate` of the calls. Used to log only
+    a sample of bulky records, e.g. full message payloads.
+    """
+    return rate >= 1 or random.random() < rate
@@ -1,12 +1,20 @@
+import time
+_started_at = time.perf_counter()  # startup time includes the imports below
+
 from message_processor import MessageProcessor
 from output_formatter import _OutputFormatter
 from covid_info_api import COVIDInfoApi
-
-import re
-import tempfile
+from dispatcher import ChannelDispatcher
+from store import DataStore
+from instrumentation import metrics
+from supervisor import ProcessDispatcher
+from slack_outbox import SlackOutbox
+from log_config import configure_logging, forward_logging, sampled
+
+import multiprocessing
 import os
 import logging
-import time 
+import threading
 
 import slack
 from slack.errors import SlackApiError
@@ -17,24 +25,51 @@ from slack.web.client import WebClient
 import nest_asyncio
 nest_asyncio.apply()
 
-# Set up logging
-logging.basicConfig(filename='../covidbot.log',
-                    filemode='a',
-                    format='%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S',
-                    level=logging.INFO
-                            )
 logger = logging.getLogger(__name__)
 
 
+# Each outbox thread posts through its own WebClient. The client handed to
+# the RTM callback is bound to the RTM event loop and can't be used from 
+# another thread.
+_worker_state = threading.local()
+
+
+class _TimedWebClient:
+    """Wraps a WebClient to record the latency of the Slack API calls we make."""
+    def __init__(self, web_client):
+        self._web_client = web_client
+
+    def chat_postMessage(self, **kwargs):
+        with metrics.timer("covidbot_stage_seconds", stage="slack_post"):
+            return self._web_client.chat_postMessage(**kwargs)
+
+    def api_call(self, api_method, **kwargs):
+        stage = "slack_upload" if api_method == "files.upload" else "slack_post"
+        with metrics.timer("covidbot_stage_seconds", stage=stage):
+            return self._web_client.api_call(api_method, **kwargs)
+
+
+def _worker_web_client():
+    web_client = getattr(_worker_state, 'web_client', None)
+    if web_client is None:
+        web_client = _TimedWebClient(WebClient(slack_bot_token, timeout=30))
+        _worker_state.web_client = web_client
+    return web_client
+
+
 @RTMClient.run_on(event='message')
 def msg_detected(**payload):
-    logger.info(payload)
+    """
+    RTM callback. Only filters and parses the message on the event loop; the
+    reply (API calls, plotting, posting) is queued on the dispatcher so one 
+    slow request doesn't hold up messages from everyone else.
+    """
     data = payload['data']
+    if sampled(_payload_log_rate):
+        logger.info("Message payload (sampled)", extra={"payload": data})
 
     message_text = (data['text'].lower())  # make all text lower to simplify pattern matching
     channel_id = data['channel']
-    webclient = payload['web_client']
 
     # check if the message event is from the bot
     if list(data)[0] == 'subtype':
@@ -46,123 +81,126 @@ def msg_detected(**payload):
         logger.info('Not a DM to the bot. Ingorning the message')
         return
 
-    processed_message_details = msg_processor.process(message_text)
-    logger.info("Processed message details")
-    logger.info(processed_message_details)
-
-    if re.search(r'(\bhi\b|\bhello\b)', message_text):
-        user = data['user']
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text="Hello <@{}>!".format(user),
-        )
-    
-    if re.search(r'(are\syou(\sdo)?|is\sit\sgo)', message_text):
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text="Doing good. How about yourself?",
-        )
-    if processed_message_details.get('countries_detected')!= []:
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text= "Fetching results. Give me a few seconds...",
-        )
-
-        response, plot = _output_formatter._format_for_status_updates(processed_message_details, api_object)
-
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text= response
-        )
-
-        if plot is not None:
-            with tempfile.TemporaryDirectory() as tmpdirname:
-                full_path = os.path.join(tmpdirname, 'plot.png')
-                plot.savefig(full_path)
-                with open(full_path, 'rb') as att:
-                    r = webclient.api_call("files.upload", files={
-                        'file': att,
-                            }, data={
-                        'channels': channel_id,
-                        'filename': 'downloaded_filename.jpeg',
-                        'title': 'Requested plot',
-                        'initial_comment': 'Requested plot'
-                    })
-            assert os.path.exists(full_path) == False # temp directory must be deleted outside 
-                                                      # context manager
-
-    if processed_message_details.get('talking_about_symptoms'): 
-        time.sleep(_pause_for_seconds_before_reply)
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text=_output_formatter._format_for_symptoms(),
-        )
-    
-    if processed_message_details.get('talking_about_spread'):
-        time.sleep(_pause_for_seconds_before_reply)
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text=_output_formatter._format_for_spread(),
-        )
-    
-    if processed_message_details.get('talking_about_vaccine'):
-        time.sleep(_pause_for_seconds_before_reply)
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text=_output_formatter._format_for_vaccine(),
-        )
-
-    if processed_message_details.get('talking_about_prevention'):
-        time.sleep(_pause_for_seconds_before_reply)
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text= _output_formatter._format_for_prevention(),
-        )
-
-    if processed_message_details.get('talking_about_thanks'):
-        time.sleep(_pause_for_seconds_before_reply)
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text=_output_formatter._format_for_thanks(),
-        )
-    if processed_message_details.get('talking_about_yourself'):
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text=_output_formatter._format_for_introduction(),
-        )
-    if processed_message_details.get('talking_about_bye'):
-        time.sleep(_pause_for_seconds_before_reply)
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text=_output_formatter._format_for_bye(),
-        )
-        
-    if not any(bool(e) for e in processed_message_details.values()) and\
-         re.search(r'(\bhi\b|\bhello\b)', message_text) is None and\
-         re.search(r'(are\syou(\sdo)?|is\sit\sgo)', message_text) is None:
-        time.sleep(_pause_for_seconds_before_reply)
-        webclient.chat_postMessage(
-            channel=channel_id,
-            text=_output_formatter._format_default_response(),
-        )     
+    with metrics.timer("covidbot_stage_seconds", stage="process"):
+        processed_message_details, intents = msg_processor.analyse(message_text)
+    logger.info("Processed message details",
+                extra={"channel": channel_id, "details": processed_message_details})
+
+    dispatcher.submit(channel_id, reply, data, processed_message_details, intents, time.perf_counter())
+
+
+def reply(data, processed_message_details, intents, queued_at=None):
+    """
+    Build the reply to one processed message and queue it for posting. Runs
+    on a dispatcher worker thread, in order with the other messages from the
+    same channel.
+    """
+    if queued_at is not None:
+        metrics.observe("covidbot_stage_seconds", time.perf_counter() - queued_at, stage="queue_wait")
+    with metrics.timer("covidbot_stage_seconds", stage="reply"):
+        _reply(data, processed_message_details, intents)
+
+
+def _reply(data, processed_message_details, intents):
+    # Every part of the reply goes out in one message (plus the plot, if 
+    # any), posted by the outbox so this thread can move on
+    with metrics.timer("covidbot_stage_seconds", stage="build_reply"):
+        sections, plot = _output_formatter._format_reply(processed_message_details, intents,
+                                                         api_object, user=data.get('user'))
+    outbox.post(data['channel'], sections, plot)
+
+
+# Upstream request budget (requests per second, burst) of the whole bot
+RATE_LIMIT = 5
+RATE_BURST = 10
+
+
+def _new_api_object(settings):
+    # In supervisor mode the budget is split between the supervisor (which
+    # only refreshes the country list) and the workers
+    processes = settings['processes'] + 1 if settings['processes'] > 1 else 1
+    return COVIDInfoApi(render_mode=settings['render_mode'], store=DataStore(settings['db']),
+                        rate_limit=RATE_LIMIT / processes, rate_burst=max(1, RATE_BURST // processes))
+
+
+def _init_worker(index, log_queue, settings):
+    """
+    Set up a worker process of the supervisor mode: the module globals 
+    `reply` uses, logging through the supervisor and (optionally) metrics 
+    on the port after the supervisor's, plus `index`.
+    """
+    global api_object, _output_formatter, outbox, slack_bot_token
+
+    forward_logging(log_queue)
+    slack_bot_token = os.environ.get('SLACK_BOT_TOKEN')
+
+    # Data, the summary snapshot and plots are shared through the store, so
+    # the first worker alone refreshes them ahead of time. Plots render on
+    # the worker's threads: the worker is already one of several processes,
+    # and being a daemon process it can't start a render pool of its own.
+    api_object = _new_api_object(dict(settings, render_mode='thread'))
+    if index == 0:
+        api_object.start_refresh_scheduler()
+    api_object.preload_plotting()
+    _output_formatter = _OutputFormatter()
+    outbox = SlackOutbox(_worker_web_client)
+    metrics.register_gauge("covidbot_pending_posts", outbox.pending)
+    api_object.register_metrics()
 
-if __name__ =="__main__":
+    if settings['metrics_port']:
+        metrics.start_http_server(settings['metrics_port'] + 1 + index)
+    if settings['metrics_dump_seconds']:
+        metrics.start_periodic_dump(settings['metrics_dump_seconds'])
 
-    # Set up logging
-    logging.basicConfig(filename='../covidbot.log',
-                        filemode='a',
-                        format='%(asctime)s,%(msecs)d %(name)s %(levelname)s %(message)s',
-                        datefmt='%H:%M:%S',
-                        level=logging.INFO
-                        )
 
-    logger = logging.getLogger(__name__)
+if __name__ =="__main__":
+
+    settings = {
+        'processes': int(os.environ.get('COVIDBOT_PROCESSES', 1)),
+        'render_mode': os.environ.get('COVIDBOT_RENDER_MODE', 'thread'),
+        'db': os.environ.get('COVIDBOT_DB', '../covidbot.db'),
+        'max_workers': int(os.environ.get('COVIDBOT_MAX_WORKERS', 4)),
+        'metrics_port': int(os.environ.get('COVIDBOT_METRICS_PORT') or 0),
+        'metrics_dump_seconds': float(os.environ.get('COVIDBOT_METRICS_DUMP_SECONDS') or 0),
+    }
+    supervisor_mode = settings['processes'] > 1
+
+    # Set up logging. Records are written by a background thread; only a
+    # sample of the raw message payloads is logged. In supervisor mode the 
+    # worker processes send their records here.
+    log_queue = multiprocessing.get_context('spawn').Queue() if supervisor_mode else None
+    configure_logging(path=os.environ.get('COVIDBOT_LOG', '../covidbot.log'), log_queue=log_queue)
+    _payload_log_rate = float(os.environ.get('COVIDBOT_LOG_SAMPLE_RATE', 0.01))
 
     # Initialize the message processing and ouput 
-    api_object = COVIDInfoApi()
+    api_object = _new_api_object(settings)
     msg_processor = MessageProcessor(api_object)
-    _output_formatter = _OutputFormatter()
-    _pause_for_seconds_before_reply = 1
+
+    if supervisor_mode:
+        # This process only reads and parses messages. Replies (fetching, 
+        # plotting, posting) run on worker processes, each channel on one
+        # of them.
+        dispatcher = ProcessDispatcher(settings['processes'], initializer=_init_worker,
+                                       initargs=(log_queue, settings),
+                                       threads_per_worker=settings['max_workers'])
+    else:
+        api_object.start_refresh_scheduler()
+        _output_formatter = _OutputFormatter()
+
+        # Worker pool that runs the replies off the RTM event loop, and the
+        # threads that post them
+        dispatcher = ChannelDispatcher(max_workers=settings['max_workers'])
+        outbox = SlackOutbox(_worker_web_client)
+        metrics.register_gauge("covidbot_pending_posts", outbox.pending)
+        api_object.register_metrics()
+
+    # Latency and cache metrics, served at http://127.0.0.1:<port>/metrics 
+    # and/or written to the log periodically
+    metrics.register_gauge("covidbot_pending_replies", dispatcher.pending)
+    if settings['metrics_port']:
+        metrics.start_http_server(settings['metrics_port'])
+    if settings['metrics_dump_seconds']:
+        metrics.start_periodic_dump(settings['metrics_dump_seconds'])
 
     # Initialize the proper slack clients
     try:
@@ -173,7 +211,10 @@ if __name__ =="__main__":
     except (SlackApiError, TypeError) as e:
         logger.error(e)
 
+    if not supervisor_mode:
+        # Load the plotting stack off the startup path, before the first plot request
+        api_object.preload_plotting()
+    logger.info("Bot ready", extra={"startup_seconds": round(time.perf_counter() - _started_at, 3)})
+
     # Start the client
     rtmclient.start()
-
-# TODO: Write tests
\ No newline at end of file
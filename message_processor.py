@@ -20,10 +20,72 @@ class MessageProcessor(object):
         7. Whether the message is talking about treatment or vaccination for the virus.
         8. Whether the message is talking about prevention or stopping the spread of the virus. 
         9. Whether the message contains 'thanks/ thank you'.
+        10. Derived metrics asked for: new cases, rolling averages, growth and
+        doubling time.
+        11. Whether the message asks for a ranking of countries ("top 10", "rank").
+
+    All the intent regexes are combined into one compiled pattern, so a message
+    is classified in a single scan (see `classify`).
     """
+    # Intent name -> regex. Names of the `talking_about_*` intents double as
+    # keys of the dictionary returned by `process`.
+    _INTENT_PATTERNS = [
+        ("talking_about_plot", r'plot|figure|chart|image'),
+        ("talking_about_yourself", r'\byourself\b|\byou\b\s\bdo\b'),
+        ("talking_about_bye", r'\bbye\b|\bgoodbye\b'),
+        ("talking_about_symptoms", r'symptoms?'),
+        ("talking_about_spread", r'spreads?'),
+        ("talking_about_vaccine", r'vaccin|drugs?|treatment|cure'),
+        ("talking_about_prevention", r'prevent|stop'),
+        ("talking_about_thanks", r'thanks|thank\syou'),
+        ("talking_about_ranking", r'\btop\b|\brank|\bhighest\b|'
+                                  r'\b(?:most|worst)\b(?=.*\b(?:cases|deaths|confirmed|recovered|hit|affected)\b)'),
+        ("confirmed", r'confirm|confrim|verify|verifi'),
+        ("recovered", r'recover'),
+        ("deaths", r'die|death'),
+        ("new_cases", r'\bnew\b(?!\s(?:zealand|guinea|caledonia))|\bdaily\b|per\sday|'
+                      r'\bcases\b(?=.*\btoday\b)|\btoday\b(?=.*\bcases\b)'),
+        ("average", r'average|\bavg\b|rolling|\b(?:7|14|seven|fourteen)[\s-]?days?\b|weekly'),
+        ("growth", r'growth|growing|doubling|trend'),
+        ("greeting", r'\bhi\b|\bhello\b'),
+        ("how_are_you", r'are\syou|is\sit\sgo'),
+    ]
+
+    # Every alternative is a lookahead, so the match is empty and the scan
+    # moves on by one character: intents whose matches overlap (e.g. 
+    # "thank you do") are all found.
+    _INTENT_REGEX = re.compile("|".join("(?=(?P<{}>{}))".format(name, pattern)
+                                        for name, pattern in _INTENT_PATTERNS))
+
+    # Precedence of the status intents when several are mentioned
+    _STATUS_INTENTS = ["confirmed", "recovered", "deaths"]
+
+    # Derived metrics that can be asked for, on top of the totals
+    _METRIC_INTENTS = ["new_cases", "average", "growth"]
+
+    # Number of countries in a ranking, e.g. "top 5", at most MAX_TOP_N
+    _TOP_N_REGEX = re.compile(r'\btop\s(\d{1,3})\b')
+    DEFAULT_TOP_N = 10
+    MAX_TOP_N = 20
+
     def __init__(self, api_object):
         self.api_object = api_object
 
+    def classify(self, message):
+        """
+        Find every intent mentioned in a (lower case) message in one pass.
+
+        Parameters
+        ----------
+        message (str): 
+            Lower case text
+        
+        Returns
+        --------
+        set: Names of the matched intents from `_INTENT_PATTERNS`
+        """
+        return {match.lastgroup for match in self._INTENT_REGEX.finditer(message)}
+
     def process(self, message) -> dict:
         """
         Extracts relevant information from a text and outputs a dictionary that
@@ -42,6 +104,8 @@ class MessageProcessor(object):
             {
             "countries_detected": [list_of_countries_extracted_from_the_text],
             "status_detected": one of "confirmed"/ "deaths"/ "recovered", 
+            "metrics_detected": [any of "new_cases"/ "average"/ "growth"],
+            "top_n": number of countries asked for in a ranking, or None,
             "talking_about_plot": bool, 
             "talking_about_yourself": bool, 
             "talking_about_bye": bool, 
@@ -49,80 +113,50 @@ class MessageProcessor(object):
             "talking_about_spread": bool, 
             "talking_about_vaccine": bool, 
             "talking_about_prevention": bool, 
-            "talking_about_thanks": bool
+            "talking_about_thanks": bool,
+            "talking_about_ranking": bool
             }
         """
-        message = message.lower()
-
-        # Extract list of countries from the message. Some country names are 
-        # seperated by spaces. To get those country names, do a n-gram scan (n=2,3,4)
-        # of the message. We stop at n=4 since all country names are atmost 4 words
-        # in length.
-        extracted_countries = [token for token in re.split("(\W+|\,+)", message) 
-                              if token in self.api_object.country_slug]
-        extracted_countries += self.__ngram_countries(message) 
-
-        # Since we have a many-to-one mapping of the country names to country codes,
-        # extract only the unique country codes
-        extracted_country_codes = list(set([self.api_object.country_slug[k]
-                                           for k in extracted_countries]))
-
-        extracted_status = self._get_status(message)
-
-        return {"countries_detected":  extracted_country_codes,
-
-                "status_detected": extracted_status,
+        return self.analyse(message)[0]
 
-                "talking_about_plot": bool(re.search(r'(plot|figure|chart|image)', 
-                                                     message)),
-
-                "talking_about_yourself": bool(re.search(r'(\byourself\b|\byou\b\s\bdo\b)', 
-                                               message)),
-
-                "talking_about_bye":  bool(re.search(r'(\bbye\b|\bgoodbye\b)', 
-                                           message)),
-
-                "talking_about_symptoms": bool(re.search(r'symptoms?[\s\S]*(virus|coronavirus|covid)?',
-                                               message)),
-
-                "talking_about_spread": bool(re.search(r'(virus|covid)?[\s\S]*spreads?', 
-                                                       message)),
-
-                "talking_about_vaccine": bool(re.search(r'(vaccin|drugs?|treatment|cure)', 
-                                                        message)),
-                
-                "talking_about_prevention": bool(re.search(r'(prevent|stop)[\s\S]*', 
-                                                           message)),
+    def analyse(self, message):
+        """
+        Same as `process`, but also returns the full set of intents found in
+        the message (including small talk like "greeting" and "how_are_you")
+        so callers don't need to scan the message again.
 
-                "talking_about_thanks": bool(re.search(r'(thanks|thank\syou)', message))
-                }
+        Returns
+        --------
+        (dict, set): The output of `process` and the output of `classify`
+        """
+        message = message.lower()
+        intents = self.classify(message)
+
+        # Extract the unique country codes mentioned in the message, in order of
+        # appearance. Many names map to the same code (e.g. "us", "usa"). 
+        # `country_slug` is a `utils.CountryIndex`, replaced whole when the
+        # country list is refreshed, and tolerates typos in the names.
+        extracted_country_codes = list(dict.fromkeys(self.api_object.country_slug.find_all(message)))
+
+        extracted_status = self.__status_from_intents(intents)
+
+        details = {"countries_detected":  extracted_country_codes,
+                   "status_detected": extracted_status,
+                   "metrics_detected": [name for name in self._METRIC_INTENTS if name in intents],
+                   "top_n": None}
+        for name, _ in self._INTENT_PATTERNS:
+            if name.startswith("talking_about_"):
+                details[name] = name in intents
+        if details["talking_about_ranking"]:
+            top_n = self._TOP_N_REGEX.search(message)
+            details["top_n"] = min(max(int(top_n.group(1)), 1), self.MAX_TOP_N) if top_n else self.DEFAULT_TOP_N
+        return details, intents
  
 
-    def __ngram_countries(self, message):
-
-        def ngrams(word_list, n):
-            return [" ".join(word_list[i:i+n]) for i in range(len(word_list) - n + 1)]
-        word_list = message.split(" ")
-
-        all_ngrams = ngrams(word_list, n=2) + ngrams(word_list, n=3) + ngrams(word_list, n=4)
-       
-        # Remove all non-unicode characters and possible , in the words
-        cleaned_all_ngrams = [re.sub(",", "", re.sub('(?![ -~]).', '', token)) 
-                              for token in all_ngrams]
-
-        return [token for token in cleaned_all_ngrams if token in self.api_object.country_slug]
-
     def _get_status(self, message):
-        
-        __confirm_regex = r'(confirm|confrim|verify|verifi)(s|ed)?'
-        __recover_regex = r'(recover)(s|ed)?'
-        __death_regex = r'(die|died|death|deaths)'
+        return self.__status_from_intents(self.classify(message))
 
-        if re.search(__confirm_regex, message):
-            return "confirmed"
-
-        if re.search(__recover_regex, message):
-            return "recovered"
-        
-        if re.search(__death_regex, message):
-            return "deaths"
\ No newline at end of file
+    def __status_from_intents(self, intents):
+        for status in self._STATUS_INTENTS:
+            if status in intents:
+                return status
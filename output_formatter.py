@@ -1,6 +1,8 @@
-from covid_info_api import COVIDInfoApi
-import requests
-import json
+def _ordinal(n):
+    """1 -> "1st", 2 -> "2nd", 11 -> "11th", ..."""
+    if 10 <= n % 100 <= 20:
+        return "{}th".format(n)
+    return "{}{}".format(n, {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th"))
 
 
 class _OutputFormatter:
@@ -8,9 +10,68 @@ class _OutputFormatter:
     A simple internal class to format output response for a given message for the 
     Covid-19 info bot. 
     """
+    # Most countries drawn in the plot of a ranking
+    MAX_PLOTTED_COUNTRIES = 5
+
     def __init__(self):
         pass
 
+    def _format_reply(self, processed_message_details, intents, api_object, user=None):
+        """
+        Collect every part of the reply to one message, so it can be posted 
+        at once.
+
+        Parameters
+        ----------
+        processed_message_details : dict
+            A dictionary that is the output of `MessageProcessor.process()` method
+        intents : set
+            Intents found in the message (see `MessageProcessor.analyse()`)
+        api_object : COVIDInfoApi
+            Used to answer questions about countries
+        user : str
+            Slack user ID of the sender, to greet them
+
+        Returns
+        -------
+        sections, plot: ([str], bytes/ None)
+            sections: Parts of the reply, in the order they should be shown
+            plot: PNG image (bytes) of the requested plot, or None
+        """
+        sections = []
+        plot = None
+
+        if 'greeting' in intents:
+            sections.append("Hello <@{}>!".format(user))
+        if 'how_are_you' in intents:
+            sections.append("Doing good. How about yourself?")
+
+        if processed_message_details.get('countries_detected'):
+            response, plot = self._format_for_status_updates(processed_message_details, api_object)
+            sections.append(response)
+
+        if processed_message_details.get('talking_about_ranking'):
+            response, ranking_plot = self._format_for_ranking(processed_message_details, api_object)
+            sections.append(response)
+            if ranking_plot is not None:
+                plot = ranking_plot
+
+        for intent, format_section in (("talking_about_symptoms", self._format_for_symptoms),
+                                       ("talking_about_spread", self._format_for_spread),
+                                       ("talking_about_vaccine", self._format_for_vaccine),
+                                       ("talking_about_prevention", self._format_for_prevention),
+                                       ("talking_about_thanks", self._format_for_thanks),
+                                       ("talking_about_yourself", self._format_for_introduction),
+                                       ("talking_about_bye", self._format_for_bye)):
+            if processed_message_details.get(intent):
+                sections.append(format_section())
+
+        # Nothing we can answer (e.g. a plot or new cases without a country)
+        if not sections:
+            sections.append(self._format_default_response())
+
+        return sections, plot
+
     def _format_for_status_updates(self, processed_message_details, api_object):
         """
         Format output response if country names are detected in the message to
@@ -26,10 +87,10 @@ class _OutputFormatter:
         
         Returns
         -------
-        response, plot: (str, figure object/ None)
+        response, plot: (str, bytes/ None)
             response: Properly formatted response for when the message to the bot
                 contains names of countries
-            plot: Matplotlib figure object that plots the number of confirmed/ recovered/ deaths
+            plot: PNG image (bytes) of the plot of the number of confirmed/ recovered/ deaths
                 cases for the list of countries detected in the message. Plotting happens
                 only if the plotting trigger words are detected in the message. 
                 Defaults to None otherwise. 
@@ -45,18 +106,108 @@ class _OutputFormatter:
         else:
             _complete_status_list = [_status_detected]
         
+        # Make sure every (country, status) pair can be answered from memory
+        # (one shared snapshot, plus a concurrent batch for anything missing),
+        # so the lookups below don't make one round-trip each.
+        api_object.prefetch_live_info([(country, _status) 
+                                       for country in processed_message_details.get('countries_detected')
+                                       for _status in _complete_status_list])
+
         for country in processed_message_details.get('countries_detected'):
             for _status in _complete_status_list:
                 response += api_object.get_live_country_info(country, _status)
 
+        # New cases, averages and growth, if asked for
+        metrics_detected = processed_message_details.get('metrics_detected')
+        if metrics_detected:
+            for _status in _complete_status_list:
+                derived = api_object.get_derived_metrics(processed_message_details.get('countries_detected'), _status)
+                for country, row in derived.items():
+                    response += self._format_derived_metrics(country, _status, row, metrics_detected)
+
         if processed_message_details["talking_about_plot"]:
-            plot = api_object.compare_country_plot(
+            plot = api_object.render_country_plot(
                                 countries=processed_message_details.get('countries_detected'), 
                                 status=_status_detected
                                 )
 
         return response, plot
 
+    def _format_for_ranking(self, processed_message_details, api_object):
+        """
+        Format output response for a ranking of the countries by number of
+        cases (of the last day, if new cases are asked for): where each of
+        the countries in the message ranks, or else the top N countries.
+
+        Returns
+        -------
+        response, plot: (str, bytes/ None)
+            plot: PNG image of the plot of the top countries (at most 
+                `MAX_PLOTTED_COUNTRIES`, in ranking order), only if a plot
+                was asked for and no countries were named. Defaults to None.
+        """
+        status = processed_message_details.get('status_detected') or "confirmed"
+        label = status if status == 'deaths' else status + " cases"
+        field = status
+        if "new_cases" in (processed_message_details.get('metrics_detected') or []):
+            field, label = "new_" + status, "new " + label
+
+        def name(country):
+            return api_object.country_name(country) or country.upper()
+
+        countries = processed_message_details.get('countries_detected')
+        if countries:
+            response = ""
+            for country in countries:
+                rank = api_object.country_rank(country, field)
+                if rank is None:
+                    response += "Sorry, I couldn't find where {} ranks right now.\n".format(name(country))
+                else:
+                    response += "{} ranks {} of {} countries by {} ({})\n".format(
+                                name(country), _ordinal(rank[0]), rank[1], label, rank[2])
+            return response, None
+
+        top = api_object.top_countries(field, processed_message_details.get('top_n') or 10)
+        if top is None:
+            return "Sorry, I couldn't get the rankings right now. Please try again later.\n", None
+        rows, as_of = top
+        response = "Top {} countries by {} as of {}:\n".format(len(rows), label, as_of)
+        response += "".join("{}. {}: {}\n".format(i, name(country), cases)
+                            for i, (country, cases) in enumerate(rows, 1))
+
+        plot = None
+        if processed_message_details.get('talking_about_plot') and rows:
+            plotted = [country for country, _ in rows[:self.MAX_PLOTTED_COUNTRIES]]
+            if len(plotted) < len(rows):
+                response += "Plotting the top {}.\n".format(len(plotted))
+            plot = api_object.render_country_plot(countries=plotted, status=status, keep_order=True)
+        return response, plot
+
+    def _format_derived_metrics(self, country, status, row, metrics_detected):
+        """
+        One line with the derived metrics (see `COVIDInfoApi.get_derived_metrics`)
+        asked for, out of "new_cases", "average" and "growth".
+        """
+        label = status if status == 'deaths' else status + " cases"
+        if row is None:
+            return "Sorry, I couldn't get the daily numbers of {} in {} right now.\n".format(label, country.upper())
+
+        parts = []
+        if "new_cases" in metrics_detected:
+            parts.append("{} new".format(row["new"]))
+        if "average" in metrics_detected:
+            parts.append("7-day average {:.0f} a day, 14-day average {:.0f} a day".format(row["avg_7"], row["avg_14"]))
+        if "growth" in metrics_detected:
+            if row["growth"] != row["growth"]:  # NaN: no cases a week ago
+                parts.append("too few cases to tell the growth")
+            elif row["growth"] > 0:
+                doubling = "every {:.0f} days".format(row["doubling_days"]) \
+                    if row["doubling_days"] <= 365 else "in over a year"
+                parts.append("growing {:.2%} a day (doubling {})".format(row["growth"], doubling))
+            else:
+                parts.append("not growing")
+        return "{} in {} as of {}: {}\n".format(label.capitalize(), country.upper(), row["date"], ", ".join(parts))
+
     def _format_for_symptoms(self):
         response = "Symptoms:\nThe most common symptoms of COVID-19 are fever, tiredness, and dry cough. " +\
         "Some patients may have aches and pains, nasal congestion, runny nose, sore throat or diarrhea.\n" +\
@@ -113,6 +264,8 @@ class _OutputFormatter:
         "`@covid19-info-bot Can you tell me the number of confirmed cases in US and Spain?`\n" +\
         "`@covid19-info-bot Can you tell me the number of deaths in China and Italy?`\n" +\
         "`@covid19-info-bot Can you plot the number of confirmed cases in Mexico and India?`\n" +\
+        "`@covid19-info-bot What is the 7-day average of new cases in Germany?`\n" +\
+        "`@covid19-info-bot Which are the top 10 countries by deaths?`\n" +\
         "`@covid19-info-bot How does the virus spread?`\n" +\
         "`@covid19-info-bot What are the symptoms?`\n" +\
         "`@covid19-info-bot How does one prevent the virus?`\n" +\
@@ -0,0 +1,242 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
+import logging
+import time
+import math
+import io
+import os
+
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+STATUS_LIST = ['confirmed', 'recovered', 'deaths']
+
+# Line styles for the (up to) three countries that share a subplot when
+# every status is plotted
+_ALL_STATUS_STYLES = [
+    dict(marker='+', linewidth=2),
+    dict(marker='o', linestyle='None'),
+    dict(linewidth=2),
+]
+
+
+_matplotlib_lock = threading.Lock()
+_matplotlib_classes = None
+
+
+def _load_matplotlib():
+    """
+    Import matplotlib on first use and return the (Figure, FigureCanvasAgg)
+    classes. matplotlib takes most of the bot's import time, so it is only
+    loaded by processes that actually draw a plot.
+
+    The style is applied once per process (including every render worker).
+    Figures only read these rcParams, so this is safe to share between threads.
+    """
+    global _matplotlib_classes
+    with _matplotlib_lock:
+        if _matplotlib_classes is None:
+            start = time.perf_counter()
+            import matplotlib.style
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            matplotlib.style.use('fivethirtyeight')
+            _matplotlib_classes = Figure, FigureCanvasAgg
+            metrics.observe("covidbot_stage_seconds", time.perf_counter() - start, stage="import_matplotlib")
+        return _matplotlib_classes
+
+
+def _preload_matplotlib():
+    _load_matplotlib()
+
+
+def build_comparison_figure(countries, status, cases, dates, log_scale=False):
+    """
+    Builds the figure comparing the number of cases for the list of countries.
+    Countries are grouped three to a subplot, with at most three subplots
+    per row.
+
+    Only uses the object-oriented `Figure` API with an Agg canvas (no pyplot
+    state), so figures can be built concurrently from several threads.
+
+    Parameters
+    ----------
+    countries : [str]
+        List of countries with formatted names that are consistent with API call
+    status : str
+        One of "confirmed", "recovered", "deaths", "all"
+    cases, dates : (List, List)
+        Cumulative history as returned by `COVIDInfoApi.__get_country_cumulative_info`:
+        one array (or None if missing) per country. For status "all", one 
+        such list per status in the order of `STATUS_LIST`
+    log_scale: bool
+        If True plots the numbers on a log scale
+
+    Returns
+    -------
+    matplotlib.figure.Figure
+    """
+    Figure, FigureCanvasAgg = _load_matplotlib()
+
+    num_countries = len(countries)
+    subplots = math.ceil(num_countries / 3)
+    grid_x = math.ceil(subplots / 3)
+    grid_y = subplots if subplots <= 2 else 3
+
+    fig = Figure(figsize=(14, 12), linewidth=1)
+    FigureCanvasAgg(fig)
+    axs = fig.subplots(grid_x, grid_y, squeeze=False)
+
+    for k, country in enumerate(countries):
+        ax = axs.flat[k // 3]
+        # Series that could not be fetched are None and left out
+        if status != 'all':
+            if cases[k] is not None:
+                ax.plot(dates[k], cases[k], label=country.upper() + ' (' + status + ')')
+        else:
+            for a, _status in enumerate(STATUS_LIST):
+                if cases[a][k] is not None:
+                    ax.plot(dates[a][k], cases[a][k],
+                            label=country.upper() + ' (' + _status + ')',
+                            **_ALL_STATUS_STYLES[k % 3])
+
+    for ax in axs.flat:
+        ax.legend()
+        if log_scale:
+            ax.set_yscale("log")
+
+    fig.suptitle("Number of COVID-19 cases")
+    fig.autofmt_xdate()
+    fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+    return fig
+
+
+def _render_png_timed(countries, status, cases, dates, log_scale=False):
+    """
+    Builds the comparison figure (see `build_comparison_figure`) and returns
+    (PNG bytes, seconds spent building the figure, seconds spent in savefig).
+    Module level so it can be sent to a worker process. Timings are returned
+    rather than recorded so they also reach the metrics when rendering in a
+    worker process.
+    """
+    start = time.perf_counter()
+    fig = build_comparison_figure(countries, status, cases, dates, log_scale=log_scale)
+    built = time.perf_counter()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue(), built - start, time.perf_counter() - built
+
+
+class PlotRenderer:
+    """
+    Renders comparison plots to PNG bytes, either on the calling thread or
+    on a pool of worker processes, and keeps render timing statistics.
+
+    Parameters
+    ----------
+    mode : str
+        "thread" renders on the calling thread. Several threads can render
+        at the same time. "process" sends each render to a pool of
+        `max_workers` processes, so renders use several cores.
+    max_workers : int
+        Number of render processes in "process" mode. Defaults to the
+        number of CPUs.
+    timeout : float
+        Seconds a render may take in "process" mode before giving up
+
+    Render processes are started with the "spawn" method (forking a process
+    with many threads can deadlock the child on a lock held by another 
+    thread). If a render process dies, the pool is replaced and the render
+    is tried once more.
+
+    Attributes
+    ----------
+    stats: A dictionary with the number of renders, the total, last and
+        maximum render time in seconds
+
+    matplotlib is only imported by the first render (in the process that
+    renders it), unless `preload` is called first.
+    """
+    def __init__(self, mode='thread', max_workers=None, timeout=60):
+        if mode not in ('thread', 'process'):
+            raise ValueError("mode must be 'thread' or 'process', got {!r}".format(mode))
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._pool_lock = threading.Lock()
+        self._pool = self._new_pool() if mode == 'process' else None
+        self.stats = {"renders": 0, "total_seconds": 0.0,
+                      "last_seconds": None, "max_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def render(self, countries, status, cases, dates, log_scale=False):
+        """
+        Render the comparison plot. Same parameters as `build_comparison_figure`.
+
+        Returns
+        -------
+        bytes: PNG image
+
+        Raises
+        ------
+        concurrent.futures.TimeoutError
+            If a render in a worker process took longer than `timeout`
+        BrokenProcessPool
+            If the render killed a worker process twice in a row
+        """
+        start = time.perf_counter()
+        if self._pool is None:
+            png, build_seconds, savefig_seconds = _render_png_timed(countries, status, cases, dates, log_scale)
+        else:
+            png, build_seconds, savefig_seconds = self._render_in_pool(countries, status, cases, dates, log_scale)
+        seconds = time.perf_counter() - start
+        self._record(seconds)
+        metrics.observe("covidbot_stage_seconds", build_seconds, stage="build_figure")
+        metrics.observe("covidbot_stage_seconds", savefig_seconds, stage="savefig")
+        metrics.observe("covidbot_stage_seconds", seconds, stage="render")
+        return png
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers,
+                                   mp_context=multiprocessing.get_context('spawn'))
+
+    def _render_in_pool(self, *args):
+        for attempt in range(2):
+            pool = self._pool
+            try:
+                return pool.submit(_render_png_timed, *args).result(timeout=self.timeout)
+            except BrokenProcessPool:
+                logger.error("A render process died, starting a new pool")
+                with self._pool_lock:
+                    # Unless another thread replaced it already
+                    if self._pool is pool:
+                        self._pool = self._new_pool()
+                pool.shutdown(wait=False)
+                if attempt:
+                    raise
+
+    def preload(self):
+        """
+        Import matplotlib ahead of the first render without blocking: on a
+        background thread in "thread" mode, in every worker process in 
+        "process" mode.
+        """
+        if self._pool is None:
+            threading.Thread(target=_preload_matplotlib, name='covid-plot-preload', daemon=True).start()
+        else:
+            for _ in range(self.max_workers):
+                self._pool.submit(_preload_matplotlib)
+
+    def _record(self, seconds):
+        with self._stats_lock:
+            self.stats["renders"] += 1
+            self.stats["total_seconds"] += seconds
+            self.stats["last_seconds"] = seconds
+            self.stats["max_seconds"] = max(self.stats["max_seconds"], seconds)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+class RankingIndex:
+    """
+    Countries of a snapshot sorted by each of its fields (e.g. "confirmed",
+    "new_deaths"), to answer "top N" and "where does X rank" questions from
+    memory. A field is sorted the first time it is asked for, so a refreshed
+    snapshot only pays for the rankings that are actually used.
+
+    Parameters
+    ----------
+    countries : dict
+        Country code -> dictionary of field -> number (see `_Snapshot.countries`)
+    fields : iterable of str
+        Fields that can be ranked
+    """
+    def __init__(self, countries, fields):
+        self._countries = countries
+        self._fields = frozenset(fields)
+        self._slugs = np.array(sorted(countries), dtype=object)
+        self._rankings = {}  # field -> (country codes by decreasing value, decreasing values)
+
+    def _ranking(self, field):
+        ranking = self._rankings.get(field)
+        if ranking is None:
+            if field not in self._fields:
+                raise KeyError(field)
+            values = np.array([self._countries[slug][field] for slug in self._slugs], dtype=np.int64)
+            # Stable sort of the (alphabetical) codes: ties are listed alphabetically
+            order = np.argsort(-values, kind='stable')
+            ranking = self._rankings[field] = (self._slugs[order].tolist(), values[order])
+        return ranking
+
+    def top(self, field, n=10):
+        """
+        Returns
+        -------
+        [(str, int)]: The `n` (country code, value) pairs with the highest values
+        """
+        slugs, values = self._ranking(field)
+        return list(zip(slugs[:n], values[:n].tolist()))
+
+    def rank(self, country, field):
+        """
+        Returns
+        -------
+        (int, int, int) or None: Rank of the country (1 for the highest value,
+            tied countries share a rank), number of countries ranked and the
+            country's value. None for a country that isn't in the snapshot.
+        """
+        info = self._countries.get(country)
+        if info is None:
+            return None
+        _, values = self._ranking(field)
+        value = info[field]
+        # Countries with a strictly higher value
+        higher = int(np.searchsorted(-values, -value, side='left'))
+        return higher + 1, len(values), value
+
+    def __len__(self):
+        return len(self._slugs)
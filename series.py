@@ -0,0 +1,103 @@
+import zlib
+
+import numpy as np
+
+
+class CountrySeries:
+    """
+    Compact, array-backed cumulative history of the number of cases for a
+    single (country, status) pair.
+
+    Attributes
+    ----------
+    dates: numpy.ndarray of dtype datetime64[D]
+        Recorded dates, in the order returned by the API
+    cases: numpy.ndarray of dtype int64
+        Cumulative number of cases on each of the recorded dates
+    """
+    __slots__ = ('dates', 'cases')
+
+    def __init__(self, dates, cases):
+        self.dates = dates
+        self.cases = cases
+
+    @property
+    def latest(self):
+        """Cumulative number of cases on the last recorded date (int)."""
+        return int(self.cases[-1])
+
+    @property
+    def last_date(self):
+        """Last recorded date (datetime.date) or None for an empty series."""
+        if len(self.dates) == 0:
+            return None
+        return self.dates[-1].item()
+
+    @property
+    def version(self):
+        """
+        (length, last date, latest count, CRC-32 of the dates and counts):
+        changes whenever the series gets new rows or any row is revised
+        (see `merge_series`). Used to key what is computed from the series.
+        """
+        checksum = zlib.crc32(self.cases.tobytes(), zlib.crc32(self.dates.tobytes()))
+        return len(self), self.last_date, self.latest if len(self) else None, checksum
+
+    @property
+    def nbytes(self):
+        return self.dates.nbytes + self.cases.nbytes
+
+    def __len__(self):
+        return len(self.cases)
+
+    def __repr__(self):
+        return "CountrySeries(n={}, last_date={}, latest={})".format(
+            len(self), self.last_date, self.latest if len(self) else None)
+
+
+def parse_series(payload):
+    """
+    Convert a decoded `/total/country/{slug}/status/{status}` payload into
+    a `CountrySeries`.
+
+    Parameters
+    ----------
+    payload : [dict]
+        Decoded JSON response, one dict per recorded date with (at least)
+        the "Cases" and "Date" keys. Dates look like "2020-04-01T00:00:00Z"
+
+    Returns
+    -------
+    CountrySeries
+    """
+    n = len(payload)
+    cases = np.fromiter((day_info['Cases'] for day_info in payload),
+                        dtype=np.int64, count=n)
+    # numpy parses the leading "YYYY-MM-DD" directly, no need to go through
+    # datetime.date objects
+    dates = np.array([day_info['Date'][:10] for day_info in payload],
+                     dtype='datetime64[D]')
+    return CountrySeries(dates, cases)
+
+
+def merge_series(old, new):
+    """
+    Append the rows of `new` (fetched for a date range starting on or
+    before the day after `old` ends) to `old`. Rows of `old` from the first
+    date of `new` onwards are replaced, since upstream may revise the last
+    reported day.
+
+    Parameters
+    ----------
+    old, new : CountrySeries
+        Series with dates in ascending order
+
+    Returns
+    -------
+    CountrySeries
+    """
+    if len(new) == 0:
+        return old
+    cut = np.searchsorted(old.dates, new.dates[0])
+    return CountrySeries(np.concatenate([old.dates[:cut], new.dates]),
+                         np.concatenate([old.cases[:cut], new.cases]))
@@ -0,0 +1,146 @@
+import threading
+import logging
+import time
+import io
+
+from slack.errors import SlackApiError
+
+from dispatcher import ChannelDispatcher
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# Slack limits on a message's blocks
+MAX_BLOCKS = 50
+MAX_SECTION_CHARS = 3000
+
+
+def build_blocks(sections):
+    """
+    Block Kit blocks showing the sections of a reply one after the other.
+    Sections longer than a block allows are split between lines.
+
+    Returns
+    -------
+    [dict] or None: None if the reply needs more blocks than a message allows
+    """
+    blocks = []
+    for section in sections:
+        chunk = ""
+        for line in section.splitlines(keepends=True):
+            while line:
+                piece, line = line[:MAX_SECTION_CHARS], line[MAX_SECTION_CHARS:]
+                if len(chunk) + len(piece) > MAX_SECTION_CHARS:
+                    blocks.append(chunk)
+                    chunk = ""
+                chunk += piece
+        if chunk.strip():
+            blocks.append(chunk)
+    if len(blocks) > MAX_BLOCKS:
+        return None
+    return [{"type": "section", "text": {"type": "mrkdwn", "text": text}} for text in blocks]
+
+
+def _retry_after(error):
+    """Seconds Slack asked us to wait, if `error` is a rate limit (HTTP 429), else None."""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) != 429:
+        return None
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('Retry-After') or headers.get('retry-after')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 1.0
+
+
+class SlackOutbox:
+    """
+    Posts replies to Slack from a small pool of threads, so the threads
+    answering messages don't wait on Slack. Each reply is a single message
+    (Block Kit sections, with the plain text as fallback) plus an upload
+    when there is a plot. Replies to the same channel are posted in order.
+
+    When Slack answers HTTP 429, every sender pauses for the `Retry-After`
+    seconds it asks for, then the same call is retried (at most `max_retries`
+    times).
+
+    Parameters
+    ----------
+    client_factory : callable
+        Returns the web client to post with on the calling thread
+    max_workers : int
+        Number of replies posted at the same time
+    max_retries : int
+        Retries of a rate limited call
+    """
+    def __init__(self, client_factory, max_workers=2, max_retries=3):
+        self._client_factory = client_factory
+        self.max_retries = max_retries
+        self._dispatcher = ChannelDispatcher(max_workers=max_workers)
+        self._paused_until = 0.0  # time.monotonic() until which nothing is sent
+        self._lock = threading.Lock()
+
+    def post(self, channel, sections, plot=None):
+        """
+        Queue a reply to `channel`.
+
+        Parameters
+        ----------
+        channel : str
+            Slack channel ID
+        sections : [str]
+            Parts of the reply (see `_OutputFormatter._format_reply`). Nothing
+            is posted for an empty list.
+        plot : bytes
+            PNG image to upload after the message, if any
+        """
+        if sections or plot is not None:
+            self._dispatcher.submit(channel, self._send, channel, sections, plot)
+
+    def _send(self, channel, sections, plot):
+        client = self._client_factory()
+        if sections:
+            message = {"channel": channel, "text": "\n\n".join(sections)}
+            blocks = build_blocks(sections)
+            if blocks:
+                message["blocks"] = blocks
+            self._call(lambda: client.chat_postMessage(**message))
+
+        if plot is not None:
+            self._call(lambda: client.api_call("files.upload", files={
+                'file': io.BytesIO(plot),
+                    }, data={
+                'channels': channel,
+                'filename': 'plot.png',
+                'title': 'Requested plot',
+                'initial_comment': 'Requested plot'
+            }))
+
+    def _call(self, send):
+        for attempt in range(self.max_retries + 1):
+            with self._lock:
+                delay = self._paused_until - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                return send()
+            except SlackApiError as e:
+                retry_after = _retry_after(e)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                metrics.inc("covidbot_slack_rate_limited_total")
+                logger.warning("Rate limited by Slack, retrying in {} s".format(retry_after))
+                with self._lock:
+                    self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def pending(self):
+        """Number of replies queued or being posted."""
+        return self._dispatcher.pending()
+
+    def join(self, timeout=None):
+        """Wait until every queued reply is posted (see `ChannelDispatcher.join`)."""
+        return self._dispatcher.join(timeout)
+
+    def shutdown(self, wait=True):
+        self._dispatcher.shutdown(wait=wait)
@@ -0,0 +1,147 @@
+import sqlite3
+import threading
+import logging
+import json
+
+import numpy as np
+
+from series import CountrySeries
+
+logger = logging.getLogger(__name__)
+
+
+class DataStore:
+    """
+    Persistent on-disk store (SQLite) for the country list and the downloaded
+    cumulative histories, so a restarted bot has warm data without waiting
+    for the API.
+
+    Series are stored as the raw bytes of their numpy arrays, so loading one
+    is a single row lookup and no parsing.
+
+    The store is also how several bot processes share data: any number of
+    processes can open the same file, and see each other's series, the
+    latest `/summary` payload and rendered plots.
+
+    Parameters
+    ----------
+    path : str
+        Path to the SQLite database file. Created if it does not exist.
+    """
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS countries (
+            name TEXT PRIMARY KEY,
+            slug TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS series (
+            slug TEXT NOT NULL,
+            status TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            dates BLOB NOT NULL,
+            cases BLOB NOT NULL,
+            PRIMARY KEY (slug, status)
+        );
+        CREATE TABLE IF NOT EXISTS snapshot (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            fetched_at REAL NOT NULL,
+            payload TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS plots (
+            key TEXT PRIMARY KEY,
+            stored_at REAL NOT NULL,
+            png BLOB NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            # WAL lets readers (other bot processes) work while one of them writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(self._SCHEMA)
+
+    def load_countries(self):
+        """
+        Returns
+        -------
+        [(str, str)]: Stored (country name, country code) pairs. Empty if
+            nothing was stored yet.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT name, slug FROM countries").fetchall()
+
+    def save_countries(self, countries):
+        """Replace the stored country list with the (name, country code) pairs."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM countries")
+            self._conn.executemany("INSERT OR REPLACE INTO countries VALUES (?, ?)", countries)
+
+    def load_series(self, slug, status):
+        """
+        Returns
+        -------
+        (series.CountrySeries, float) or None: Stored series and the time
+            (seconds since the epoch) it was fetched at
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dates, cases, fetched_at FROM series WHERE slug = ? AND status = ?",
+                (slug, status)).fetchone()
+        if row is None:
+            return None
+        dates, cases, fetched_at = row
+        series = CountrySeries(np.frombuffer(dates, dtype='datetime64[D]'),
+                               np.frombuffer(cases, dtype=np.int64))
+        return series, fetched_at
+
+    def save_series(self, slug, status, series, fetched_at):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)",
+                (slug, status, fetched_at, series.dates.tobytes(), series.cases.tobytes()))
+
+    def load_snapshot(self):
+        """
+        Returns
+        -------
+        (dict, float) or None: Stored `/summary` payload and the time (seconds
+            since the epoch) it was fetched at
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT payload, fetched_at FROM snapshot").fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def save_snapshot(self, payload, fetched_at):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO snapshot VALUES (0, ?, ?)",
+                               (fetched_at, json.dumps(payload)))
+
+    def load_plot(self, key):
+        """Returns the stored PNG (bytes) for the plot `key` (str), or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT png FROM plots WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def save_plot(self, key, png, stored_at, max_bytes):
+        """
+        Store a rendered plot, then drop the oldest plots until the stored
+        ones take at most `max_bytes`.
+        """
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO plots VALUES (?, ?, ?)", (key, stored_at, png))
+            total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(png)), 0) FROM plots").fetchone()[0]
+            if total > max_bytes:
+                for old_key, size in self._conn.execute(
+                        "SELECT key, LENGTH(png) FROM plots ORDER BY stored_at").fetchall():
+                    if total <= max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM plots WHERE key = ?", (old_key,))
+                    total -= size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
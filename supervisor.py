@@ -0,0 +1,135 @@
+import multiprocessing
+import threading
+import logging
+import zlib
+
+from dispatcher import ChannelDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(index, jobs, pending, taken, initializer, initargs, threads):
+    if initializer is not None:
+        initializer(index, *initargs)
+    dispatcher = ChannelDispatcher(max_workers=threads)
+
+    def run(func, args, kwargs):
+        try:
+            func(*args, **kwargs)
+        finally:
+            with taken.get_lock():
+                taken.value -= 1
+            with pending.get_lock():
+                pending.value -= 1
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        with taken.get_lock():
+            taken.value += 1
+        channel, func, args, kwargs = job
+        dispatcher.submit(channel, run, func, args, kwargs)
+    dispatcher.shutdown()
+
+
+class ProcessDispatcher:
+    """
+    Drop-in replacement for `dispatcher.ChannelDispatcher` that runs the
+    jobs on `num_workers` worker processes, so CPU-heavy replies (plotting)
+    use several cores.
+
+    Each worker process has its own job queue. A channel's jobs always go
+    to the same worker (by a hash of the channel), where they run one at a
+    time and in order on a `ChannelDispatcher` with `threads_per_worker`
+    threads. A worker that died is restarted on the next job for it or
+    the next `pending()` call. The jobs it had already taken from its queue
+    are logged as failed and not retried (they may have posted a reply);
+    the jobs still queued run on the restarted worker.
+
+    Workers are started with the "spawn" method, so they don't inherit the
+    supervisor's threads and connections. `func` and its arguments must be
+    picklable, i.e. functions defined at module level.
+
+    Parameters
+    ----------
+    num_workers : int
+        Number of worker processes
+    initializer : callable
+        Called as `initializer(worker_index, *initargs)` when a worker
+        process starts, e.g. to set up the module globals the jobs use
+    initargs : tuple
+        Extra arguments for `initializer`
+    threads_per_worker : int
+        Maximum number of jobs that run at the same time in one worker
+    """
+    def __init__(self, num_workers, initializer=None, initargs=(), threads_per_worker=4):
+        self._context = multiprocessing.get_context('spawn')
+        self._initializer = initializer
+        self._initargs = initargs
+        self._threads = threads_per_worker
+        self._pending = self._context.Value('i', 0)
+        self._queues = [self._context.Queue() for _ in range(num_workers)]
+        # Jobs each worker took from its queue and has not finished yet
+        self._taken = [self._context.Value('i', 0) for _ in range(num_workers)]
+        self._workers = [None] * num_workers
+        self._lock = threading.Lock()
+        self._closed = False
+        for index in range(num_workers):
+            self._start(index)
+
+    def _start(self, index):
+        worker = self._context.Process(
+            target=_worker_main, name='covid-worker-{}'.format(index), daemon=True,
+            args=(index, self._queues[index], self._pending, self._taken[index],
+                  self._initializer, self._initargs, self._threads))
+        worker.start()
+        self._workers[index] = worker
+
+    def _restart_if_dead(self, index):
+        """Restart worker `index` if it died, failing the jobs it had taken. Call with `_lock` held."""
+        worker = self._workers[index]
+        if self._closed or worker.is_alive():
+            return
+        taken = self._taken[index]
+        with taken.get_lock():
+            lost, taken.value = taken.value, 0
+        with self._pending.get_lock():
+            self._pending.value -= lost
+        logger.error("Worker {} exited with code {}, restarting it. {} job(s) it was running failed".format(
+                     index, worker.exitcode, lost))
+        self._start(index)
+
+    def submit(self, channel, func, *args, **kwargs):
+        """
+        Queue `func(*args, **kwargs)` to run after every job already
+        submitted for `channel`.
+        """
+        index = zlib.crc32(channel.encode('utf-8')) % len(self._queues)
+        with self._lock:
+            self._restart_if_dead(index)
+        with self._pending.get_lock():
+            self._pending.value += 1
+        self._queues[index].put((channel, func, args, kwargs))
+
+    def pending(self):
+        """Number of jobs submitted but not yet finished, over all workers."""
+        with self._lock:
+            for index in range(len(self._workers)):
+                self._restart_if_dead(index)
+        return self._pending.value
+
+    def shutdown(self, wait=True):
+        """
+        Stop the worker processes. With `wait`, every job already submitted
+        is run first.
+        """
+        with self._lock:
+            self._closed = True
+        for jobs in self._queues:
+            jobs.put(None)
+        for worker in self._workers:
+            if wait:
+                worker.join()
+            else:
+                worker.terminate()
@@ -0,0 +1,10 @@
+import numpy as np
+
+from series import CountrySeries
+
+
+def make_series(cases, start='2020-03-01', dates=None):
+    """`CountrySeries` of `cases`, on `dates` or on consecutive days from `start`."""
+    if dates is None:
+        dates = np.arange(np.datetime64(start), np.datetime64(start) + len(cases), dtype='datetime64[D]')
+    return CountrySeries(np.array(dates, dtype='datetime64[D]'), np.array(cases, dtype=np.int64))
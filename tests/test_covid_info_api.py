@@ -0,0 +1,196 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from requests.exceptions import ConnectionError
+
+from benchmarks.fake_upstream import FakeCovidApi
+
+from covid_info_api import (COVIDInfoApi, PRIORITY_BACKGROUND, PRIORITY_LIVE, PRIORITY_PLOT,
+                            _SingleFlight, _TokenBucket)
+from store import DataStore
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        bucket = _TokenBucket(rate=50, capacity=3)
+        start = time.monotonic()
+        for _ in range(5):
+            self.assertTrue(bucket.acquire())
+        # 3 tokens right away, then 2 more at 50 per second
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+        self.assertEqual(bucket.stats["granted"], 5)
+
+    def test_gives_up_after_max_wait(self):
+        bucket = _TokenBucket(rate=0.1, capacity=1, max_wait={PRIORITY_LIVE: 0.05})
+        self.assertTrue(bucket.acquire(PRIORITY_LIVE))
+        self.assertFalse(bucket.acquire(PRIORITY_LIVE))
+        self.assertEqual(bucket.stats["rejected"], 1)
+
+    def test_priority_order(self):
+        bucket = _TokenBucket(rate=20, capacity=1)
+        bucket.acquire()
+        order = []
+
+        def take(priority, name):
+            bucket.acquire(priority)
+            order.append(name)
+
+        threads = [threading.Thread(target=take, args=(PRIORITY_BACKGROUND, "background"))]
+        threads[0].start()
+        time.sleep(0.01)
+        for priority, name in [(PRIORITY_PLOT, "plot"), (PRIORITY_LIVE, "live")]:
+            threads.append(threading.Thread(target=take, args=(priority, name)))
+            threads[-1].start()
+        for thread in threads:
+            thread.join()
+        # All three wait for the next token: the background caller came first
+        # but goes last
+        self.assertEqual(order, ["live", "plot", "background"])
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_one_call(self):
+        flight = _SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait()
+            return "series"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("france", fetch)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        while flight.coalesced < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["series"] * 4)
+
+    def test_exception_is_shared_and_not_cached(self):
+        flight = _SingleFlight()
+
+        def fail():
+            raise ValueError("bad payload")
+
+        with self.assertRaises(ValueError):
+            flight.do("france", fail)
+        self.assertEqual(flight.do("france", lambda: "retried"), "retried")
+
+    def test_joining_caller_promotes_the_call(self):
+        bucket = _TokenBucket(rate=10, capacity=1)
+        bucket.acquire()
+        flight = _SingleFlight(on_promote=bucket.wake)
+        order = []
+
+        def fetch(priority):
+            bucket.acquire(priority)
+            order.append("shared call")
+            return "series"
+
+        def other():
+            bucket.acquire(PRIORITY_BACKGROUND)
+            order.append("other background call")
+
+        background = threading.Thread(target=other)
+        background.start()
+        time.sleep(0.01)
+        leader = threading.Thread(target=flight.do, args=("france", fetch), kwargs={"priority": PRIORITY_BACKGROUND})
+        leader.start()
+        time.sleep(0.01)
+        result = flight.do("france", fetch, priority=PRIORITY_LIVE)
+        leader.join()
+        background.join()
+        self.assertEqual(result, "series")
+        self.assertEqual(order, ["shared call", "other background call"])
+
+
+class RevalidateTest(unittest.TestCase):
+    def setUp(self):
+        self.api = COVIDInfoApi(api_url='http://127.0.0.1:9', rate_limit=None, max_retries=0,
+                                timeout=(0.2, 0.2), background_workers=1)
+
+    def revalidate(self, func):
+        self.api._revalidate('key', func)
+        self.api._background_pool.submit(lambda: None).result()
+        self.assertNotIn('key', self.api._revalidating)
+
+    def test_network_error_is_logged_without_traceback(self):
+        def refresh():
+            raise ConnectionError("refused")
+
+        with self.assertLogs('covid_info_api', level='ERROR') as logs:
+            self.revalidate(refresh)
+        self.assertIsNone(logs.records[-1].exc_info)
+
+    def test_bug_is_logged_with_traceback(self):
+        def refresh():
+            raise KeyError("Countries")
+
+        with self.assertLogs('covid_info_api', level='ERROR') as logs:
+            self.revalidate(refresh)
+        self.assertIsNotNone(logs.records[-1].exc_info)
+
+
+class PartialPlotTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.upstream = FakeCovidApi().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.upstream.stop()
+
+    def test_missing_series_does_not_shift_labels(self):
+        api = COVIDInfoApi(api_url=self.upstream.url, rate_limit=None, max_retries=0)
+        with self.assertLogs('covid_info_api', level='ERROR'):
+            fig = api.compare_country_plot(['atlantis', 'france', 'italy'], 'confirmed')
+        lines = fig.axes[0].get_lines()
+        self.assertEqual([line.get_label() for line in lines], ['FRANCE (confirmed)', 'ITALY (confirmed)'])
+        france = api._load_series('france', 'confirmed')
+        self.assertEqual(lines[0].get_ydata()[-1], france.latest)
+
+
+class SnapshotStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeCovidApi().start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stores = [DataStore(os.path.join(self.tmp.name, 'data.db')) for _ in range(2)]
+        self.apis = [COVIDInfoApi(api_url=self.upstream.url, rate_limit=None, store=store, snapshot_ttl=60)
+                     for store in self.stores]
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.tmp.cleanup()
+        self.upstream.stop()
+
+    def test_force_calls_upstream(self):
+        first = self.apis[0].get_snapshot()
+        requests = self.upstream.requests
+        forced = self.apis[0].get_snapshot(force=True)
+        self.assertEqual(self.upstream.requests, requests + 1)
+        self.assertGreater(forced.fetched_at, first.fetched_at)
+
+    def test_stale_refresh_uses_newer_stored_copy(self):
+        self.apis[0].get_snapshot()
+        self.apis[0]._snapshot.fetched_at -= 120
+        stale = self.apis[0]._snapshot
+        newer = self.apis[1].get_snapshot(force=True)
+        requests = self.upstream.requests
+
+        self.assertIs(self.apis[0].get_snapshot(), stale)
+        deadline = time.monotonic() + 5
+        while self.apis[0]._snapshot is stale and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.apis[0]._snapshot.fetched_at, newer.fetched_at)
+        self.assertEqual(self.upstream.requests, requests)
+
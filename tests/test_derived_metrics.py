@@ -0,0 +1,70 @@
+import math
+import unittest
+
+import numpy as np
+
+from derived_metrics import DerivedMetricsCache, compute_metrics
+from tests.conftest import make_series
+
+
+class ComputeMetricsTest(unittest.TestCase):
+    def test_linear_series(self):
+        metrics = compute_metrics([make_series(np.arange(30) * 10)])
+        self.assertEqual(metrics["new"].tolist(), [10])
+        self.assertEqual(metrics["avg_7"].tolist(), [10.0])
+        self.assertEqual(metrics["avg_14"].tolist(), [10.0])
+        self.assertEqual(str(metrics["date"][0]), '2020-03-30')
+
+    def test_doubling_series(self):
+        # Doubles every 7 days
+        metrics = compute_metrics([make_series(np.round(1000 * 2 ** (np.arange(30) / 7)))])
+        self.assertAlmostEqual(metrics["growth"][0], 2 ** (1 / 7) - 1, places=3)
+        self.assertAlmostEqual(metrics["doubling_days"][0], 7, places=1)
+
+    def test_flat_and_empty_start(self):
+        metrics = compute_metrics([make_series([5] * 20), make_series([0] * 20)])
+        self.assertEqual(metrics["new"].tolist(), [0, 0])
+        self.assertEqual(metrics["growth"][0], 0)
+        self.assertTrue(math.isinf(metrics["doubling_days"][0]))
+        self.assertTrue(math.isnan(metrics["growth"][1]))
+
+    def test_missing_days_keep_previous_count(self):
+        dates = ['2020-03-01', '2020-03-02', '2020-03-05']
+        metrics = compute_metrics([make_series([10, 20, 50], dates=dates)], windows=(3,), growth_days=3)
+        # Days 03-03 and 03-04 are missing: the count stays at 20 on them
+        self.assertEqual(metrics["new"].tolist(), [30])
+        self.assertEqual(metrics["avg_3"].tolist(), [10.0])
+
+    def test_each_series_as_of_its_own_last_date(self):
+        metrics = compute_metrics([make_series(np.arange(20)), make_series(np.arange(25) * 2)])
+        self.assertEqual([str(d) for d in metrics["date"]], ['2020-03-20', '2020-03-25'])
+        self.assertEqual(metrics["new"].tolist(), [1, 2])
+
+
+class DerivedMetricsCacheTest(unittest.TestCase):
+    def test_cached_until_series_changes(self):
+        cache = DerivedMetricsCache()
+        series = make_series(np.arange(30) * 10)
+        first, = cache.get_many([("france", series)])
+        again, = cache.get_many([("france", series)])
+        self.assertIs(first, again)
+        self.assertEqual(first["avg_7"], 10.0)
+
+        longer = make_series(np.arange(31) * 10)
+        updated, = cache.get_many([("france", longer)])
+        self.assertIsNot(updated, first)
+
+    def test_revised_earlier_day_is_recomputed(self):
+        cache = DerivedMetricsCache()
+        cases = np.arange(30) * 10
+        cache.get_many([("france", make_series(cases))])
+        revised = cases.copy()
+        revised[-8] -= 7  # Same length, last date and latest count
+        row, = cache.get_many([("france", make_series(revised))])
+        self.assertEqual(row["avg_7"], 11.0)
+
+    def test_lru_bound(self):
+        cache = DerivedMetricsCache(maxsize=2)
+        for key in "abc":
+            cache.get_many([(key, make_series(np.arange(20)))])
+        self.assertEqual(list(cache._entries), ["b", "c"])
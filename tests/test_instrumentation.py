@@ -0,0 +1,67 @@
+import logging
+import time
+import unittest
+from unittest import mock
+
+from requests.exceptions import ConnectionError
+
+from covid_info_api import COVIDInfoApi, _HttpClient
+from instrumentation import MetricsRegistry
+
+
+class MetricsRegistryTest(unittest.TestCase):
+    def test_render(self):
+        registry = MetricsRegistry(buckets=(0.1, 1))
+        registry.inc("hits_total", cache="plot")
+        registry.inc("hits_total", cache="plot")
+        registry.observe("latency_seconds", 0.5, stage="render")
+        registry.register_gauge("pending", lambda: 3)
+        text = registry.render()
+        self.assertIn('hits_total{cache="plot"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="render",le="0.1"} 0', text)
+        self.assertIn('latency_seconds_bucket{stage="render",le="1"} 1', text)
+        self.assertIn('latency_seconds_count{stage="render"} 1', text)
+        self.assertIn("pending 3", text)
+
+    def test_render_after_status_code_and_network_error(self):
+        registry = MetricsRegistry()
+        client = _HttpClient(max_retries=0)
+        response = mock.Mock(status_code=200)
+        with mock.patch('instrumentation.metrics', registry), mock.patch('covid_info_api.metrics', registry):
+            with mock.patch.object(client._session, 'get', return_value=response):
+                client.get("http://upstream/summary")
+            with mock.patch.object(client._session, 'get', side_effect=ConnectionError("refused")):
+                with self.assertRaises(ConnectionError):
+                    client.get("http://upstream/summary")
+        text = registry.render()
+        self.assertIn('covidbot_upstream_responses_total{code="200",endpoint="summary"} 1', text)
+        self.assertIn('covidbot_upstream_responses_total{code="ConnectionError",endpoint="summary"} 1', text)
+
+    def test_periodic_dump_survives_errors(self):
+        registry = MetricsRegistry()
+        log = mock.Mock(spec=logging.Logger)
+        calls = []
+
+        def info(message):
+            calls.append(message)
+            if len(calls) == 1:
+                raise RuntimeError("disk full")
+
+        log.info.side_effect = info
+        with self.assertLogs('instrumentation', level='ERROR'):
+            registry.start_periodic_dump(0.01, log=log)
+            time.sleep(0.05)
+        self.assertGreater(log.info.call_count, 1)
+
+
+class ApiMetricsTest(unittest.TestCase):
+    def test_limiter_and_render_stats_are_exported(self):
+        registry = MetricsRegistry()
+        api = COVIDInfoApi(api_url='http://127.0.0.1:9', max_retries=0, timeout=(0.2, 0.2))
+        api.register_metrics(registry)
+        text = registry.render()
+        self.assertIn('covidbot_limiter_queue_depth{priority="live"} 0', text)
+        self.assertIn('covidbot_limiter_queue_depth{priority="background"} 0', text)
+        self.assertIn('covidbot_upstream_requests 1', text)  # the /countries call
+        self.assertIn('covidbot_renders 0', text)
+        self.assertIn('covidbot_cached_plot_bytes 0', text)
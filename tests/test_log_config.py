@@ -0,0 +1,40 @@
+import logging
+import queue
+import json
+import unittest
+
+from log_config import StructuredFormatter, _StructuredQueueHandler
+
+
+class StructuredQueueHandlerTest(unittest.TestCase):
+    def setUp(self):
+        self.queue = queue.SimpleQueue()
+        self.logger = logging.getLogger("tests.log_config")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = _StructuredQueueHandler(self.queue)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def formatted(self):
+        return json.loads(StructuredFormatter().format(self.queue.get_nowait()))
+
+    def test_traceback_goes_to_exception_field(self):
+        try:
+            raise ValueError("bad payload")
+        except ValueError:
+            self.logger.exception("Refresh of %s failed", "france", extra={"channel": "C1"})
+        entry = self.formatted()
+        self.assertEqual(entry["message"], "Refresh of france failed")
+        self.assertEqual(entry["channel"], "C1")
+        self.assertIn("ValueError: bad payload", entry["exception"])
+        self.assertNotIn("Traceback", entry["message"])
+
+    def test_record_without_exception(self):
+        self.logger.info("Bot ready", extra={"startup_seconds": 0.2})
+        entry = self.formatted()
+        self.assertEqual(entry["message"], "Bot ready")
+        self.assertEqual(entry["startup_seconds"], 0.2)
+        self.assertNotIn("exception", entry)
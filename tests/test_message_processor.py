@@ -0,0 +1,59 @@
+import unittest
+
+from message_processor import MessageProcessor
+from utils import CountryIndex
+
+
+class _Api:
+    country_slug = CountryIndex([("France", "france"), ("Italy", "italy"), ("Germany", "germany"),
+                                 ("New Zealand", "new-zealand"), ("United States", "united-states"),
+                                 ("usa", "united-states")])
+
+
+class ClassifyTest(unittest.TestCase):
+    def setUp(self):
+        self.processor = MessageProcessor(_Api())
+
+    def test_overlapping_intents(self):
+        self.assertEqual(self.processor.classify("thank you do you know the symptoms"),
+                         {"talking_about_thanks", "talking_about_yourself", "talking_about_symptoms"})
+        self.assertEqual(self.processor.classify("hi, plot deaths"),
+                         {"greeting", "talking_about_plot", "deaths"})
+
+    def test_new_cases(self):
+        self.assertIn("new_cases", self.processor.classify("new cases in italy"))
+        self.assertIn("new_cases", self.processor.classify("how many cases today"))
+        self.assertNotIn("new_cases", self.processor.classify("confirmed cases in new zealand"))
+        self.assertNotIn("new_cases", self.processor.classify("how are you today"))
+        self.assertNotIn("new_cases", self.processor.classify("deaths in italy today"))
+
+    def test_ranking(self):
+        self.assertIn("talking_about_ranking", self.processor.classify("which countries have the most deaths"))
+        self.assertNotIn("talking_about_ranking", self.processor.classify("what are the most common symptoms"))
+
+
+class ProcessTest(unittest.TestCase):
+    def setUp(self):
+        self.processor = MessageProcessor(_Api())
+
+    def test_countries_and_status(self):
+        details = self.processor.process("Plot the deaths in France, the USA and france")
+        self.assertEqual(details["countries_detected"], ["france", "united-states"])
+        self.assertEqual(details["status_detected"], "deaths")
+        self.assertTrue(details["talking_about_plot"])
+        self.assertFalse(details["talking_about_ranking"])
+        self.assertIsNone(details["top_n"])
+
+    def test_status_precedence(self):
+        self.assertEqual(self.processor.process("confirmed and recovered cases")["status_detected"], "confirmed")
+        self.assertIsNone(self.processor.process("hello")["status_detected"])
+
+    def test_metrics(self):
+        details = self.processor.process("7-day average and growth of new cases in germany")
+        self.assertEqual(details["metrics_detected"], ["new_cases", "average", "growth"])
+        self.assertEqual(details["countries_detected"], ["germany"])
+
+    def test_top_n(self):
+        self.assertEqual(self.processor.process("top 5 countries by deaths")["top_n"], 5)
+        self.assertEqual(self.processor.process("rank the countries")["top_n"], MessageProcessor.DEFAULT_TOP_N)
+        self.assertEqual(self.processor.process("top 999 plot")["top_n"], MessageProcessor.MAX_TOP_N)
@@ -0,0 +1,35 @@
+import os
+import signal
+import unittest
+
+import numpy as np
+
+from plotting import PlotRenderer
+
+PNG_SIGNATURE = b'\x89PNG'
+
+
+def plot_data():
+    dates = np.arange('2020-03-01', '2020-03-11', dtype='datetime64[D]')
+    return ["france"], "confirmed", [np.arange(10) * 3], [dates]
+
+
+class PlotRendererTest(unittest.TestCase):
+    def test_thread_mode(self):
+        renderer = PlotRenderer(mode='thread')
+        self.assertTrue(renderer.render(*plot_data()).startswith(PNG_SIGNATURE))
+        self.assertEqual(renderer.stats["renders"], 1)
+
+    def test_process_mode_recovers_from_a_dead_worker(self):
+        renderer = PlotRenderer(mode='process', max_workers=1)
+        try:
+            self.assertTrue(renderer.render(*plot_data()).startswith(PNG_SIGNATURE))
+            for process in list(renderer._pool._processes.values()):
+                os.kill(process.pid, signal.SIGKILL)
+                process.join()
+            with self.assertLogs('plotting', level='ERROR'):
+                png = renderer.render(*plot_data())
+            self.assertTrue(png.startswith(PNG_SIGNATURE))
+            self.assertEqual(renderer.stats["renders"], 2)
+        finally:
+            renderer.shutdown()
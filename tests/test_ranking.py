@@ -0,0 +1,34 @@
+import unittest
+
+from ranking import RankingIndex
+
+COUNTRIES = {
+    "france": {"confirmed": 100, "deaths": 10},
+    "italy": {"confirmed": 300, "deaths": 30},
+    "spain": {"confirmed": 300, "deaths": 20},
+    "malta": {"confirmed": 5, "deaths": 0},
+}
+
+
+class RankingIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = RankingIndex(COUNTRIES, ["confirmed", "deaths"])
+
+    def test_top(self):
+        self.assertEqual(self.index.top("deaths", 2), [("italy", 30), ("spain", 20)])
+        # Ties are listed alphabetically
+        self.assertEqual(self.index.top("confirmed", 3), [("italy", 300), ("spain", 300), ("france", 100)])
+        self.assertEqual(len(self.index.top("confirmed", 50)), 4)
+
+    def test_rank(self):
+        self.assertEqual(self.index.rank("france", "confirmed"), (3, 4, 100))
+        self.assertEqual(self.index.rank("malta", "deaths"), (4, 4, 0))
+        # Tied countries share a rank
+        self.assertEqual(self.index.rank("spain", "confirmed")[0], 1)
+        self.assertEqual(self.index.rank("italy", "confirmed")[0], 1)
+
+    def test_unknown(self):
+        self.assertIsNone(self.index.rank("atlantis", "confirmed"))
+        with self.assertRaises(KeyError):
+            self.index.top("recovered")
+        self.assertEqual(len(self.index), 4)
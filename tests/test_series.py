@@ -0,0 +1,51 @@
+import datetime
+import unittest
+
+from series import merge_series, parse_series
+
+from tests.conftest import make_series
+
+
+class ParseSeriesTest(unittest.TestCase):
+    def test_parse(self):
+        series = parse_series([{"Cases": 1, "Date": "2020-04-01T00:00:00Z"},
+                               {"Cases": 5, "Date": "2020-04-02T00:00:00Z"}])
+        self.assertEqual(series.cases.tolist(), [1, 5])
+        self.assertEqual(series.last_date, datetime.date(2020, 4, 2))
+        self.assertEqual(series.latest, 5)
+        self.assertEqual(series.version[:3], (2, datetime.date(2020, 4, 2), 5))
+
+    def test_parse_empty(self):
+        series = parse_series([])
+        self.assertEqual(len(series), 0)
+        self.assertIsNone(series.last_date)
+        self.assertEqual(series.version[:3], (0, None, None))
+
+
+class MergeSeriesTest(unittest.TestCase):
+    def test_appends_new_days(self):
+        merged = merge_series(make_series([1, 2, 3], '2020-04-01'), make_series([4, 5], '2020-04-04'))
+        self.assertEqual(merged.cases.tolist(), [1, 2, 3, 4, 5])
+        self.assertEqual(merged.last_date, datetime.date(2020, 4, 5))
+
+    def test_replaces_revised_days(self):
+        # Upstream revised the last known day (3 -> 7) and added one
+        merged = merge_series(make_series([1, 2, 3], '2020-04-01'), make_series([7, 9], '2020-04-03'))
+        self.assertEqual(merged.cases.tolist(), [1, 2, 7, 9])
+        self.assertEqual(merged.dates.tolist(), [datetime.date(2020, 4, d) for d in range(1, 5)])
+
+    def test_empty_update_keeps_old(self):
+        old = make_series([1, 2, 3], '2020-04-01')
+        self.assertIs(merge_series(old, parse_series([])), old)
+
+    def test_merge_into_empty(self):
+        merged = merge_series(parse_series([]), make_series([1, 2], '2020-04-01'))
+        self.assertEqual(merged.cases.tolist(), [1, 2])
+
+
+class VersionTest(unittest.TestCase):
+    def test_revised_earlier_row_changes_version(self):
+        series = make_series([1, 2, 3, 4], '2020-04-01')
+        revised = make_series([1, 5, 3, 4], '2020-04-01')
+        self.assertEqual(series.version, make_series([1, 2, 3, 4], '2020-04-01').version)
+        self.assertNotEqual(series.version, revised.version)
@@ -0,0 +1,99 @@
+import functools
+import logging
+import os
+import queue
+import signal
+import sqlite3
+import tempfile
+import time
+import unittest
+import multiprocessing
+
+from benchmarks.fake_slack import FakeWebClient
+from benchmarks.fake_upstream import FakeCovidApi
+
+from supervisor import ProcessDispatcher
+
+try:
+    import main
+except ImportError:  # the slack client is not installed
+    main = None
+
+
+def _kill_worker():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _noop():
+    pass
+
+
+def _init_bot_worker(index, log_queue, settings, api_url):
+    import covid_info_api
+    main.COVIDInfoApi = functools.partial(covid_info_api.COVIDInfoApi, api_url=api_url)
+    main.WebClient = FakeWebClient
+    main._init_worker(index, log_queue, settings)
+
+
+def _wait_until_done(dispatcher, timeout=30):
+    deadline = time.monotonic() + timeout
+    while dispatcher.pending() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return dispatcher.pending()
+
+
+class ProcessDispatcherTest(unittest.TestCase):
+    def test_jobs_of_a_dead_worker_fail(self):
+        dispatcher = ProcessDispatcher(1, threads_per_worker=1)
+        try:
+            with self.assertLogs('supervisor', level='ERROR') as logs:
+                dispatcher.submit('C1', _kill_worker)
+                self.assertEqual(_wait_until_done(dispatcher), 0)
+            self.assertIn("1 job(s) it was running failed", logs.output[0])
+
+            dispatcher.submit('C1', _noop)
+            self.assertEqual(_wait_until_done(dispatcher), 0)
+        finally:
+            dispatcher.shutdown()
+
+
+@unittest.skipIf(main is None, "the slack client is not installed")
+class SupervisorModeTest(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeCovidApi().start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, 'data.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        self.upstream.stop()
+
+    def test_process_render_mode(self):
+        settings = {'processes': 2, 'render_mode': 'process', 'db': self.db, 'max_workers': 2,
+                    'metrics_port': 0, 'metrics_dump_seconds': 0}
+        log_queue = multiprocessing.get_context('spawn').Queue()
+        dispatcher = ProcessDispatcher(2, initializer=_init_bot_worker,
+                                       initargs=(log_queue, settings, self.upstream.url),
+                                       threads_per_worker=2)
+        processor = main.MessageProcessor(main.COVIDInfoApi(api_url=self.upstream.url, rate_limit=None))
+        try:
+            for i, text in enumerate(["plot confirmed cases in france", "chart of deaths in italy"]):
+                details, intents = processor.analyse(text)
+                channel = 'C{}'.format(i)
+                dispatcher.submit(channel, main.reply, {'channel': channel, 'user': 'U1', 'text': text},
+                                  details, intents)
+            self.assertEqual(_wait_until_done(dispatcher, timeout=60), 0)
+        finally:
+            dispatcher.shutdown()
+
+        errors = []
+        while True:
+            try:
+                record = log_queue.get(timeout=0.5)
+            except queue.Empty:
+                break
+            if record.levelno >= logging.ERROR:
+                errors.append(record.getMessage())
+        self.assertEqual(errors, [])
+        with sqlite3.connect(self.db) as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM plots").fetchone()[0], 2)
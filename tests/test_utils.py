@@ -0,0 +1,162 @@
+import unittest
+
+from covid_info_api import COUNTRY_ALIASES
+from utils import COMMON_WORDS, CountryIndex, edit_distance, normalize
+
+# (name, country code) pairs for every country /countries returns
+COUNTRIES = [
+    ('Afghanistan', 'afghanistan'), ('ALA Aland Islands', 'ala-aland-islands'), ('Albania', 'albania'),
+    ('Algeria', 'algeria'), ('American Samoa', 'american-samoa'), ('Andorra', 'andorra'),
+    ('Angola', 'angola'), ('Anguilla', 'anguilla'), ('Antarctica', 'antarctica'),
+    ('Antigua and Barbuda', 'antigua-and-barbuda'), ('Argentina', 'argentina'), ('Armenia', 'armenia'),
+    ('Aruba', 'aruba'), ('Australia', 'australia'), ('Austria', 'austria'), ('Azerbaijan', 'azerbaijan'),
+    ('Bahamas', 'bahamas'), ('Bahrain', 'bahrain'), ('Bangladesh', 'bangladesh'), ('Barbados', 'barbados'),
+    ('Belarus', 'belarus'), ('Belgium', 'belgium'), ('Belize', 'belize'), ('Benin', 'benin'),
+    ('Bermuda', 'bermuda'), ('Bhutan', 'bhutan'), ('Bolivia', 'bolivia'),
+    ('Bosnia and Herzegovina', 'bosnia-and-herzegovina'), ('Botswana', 'botswana'),
+    ('Bouvet Island', 'bouvet-island'), ('Brazil', 'brazil'),
+    ('British Indian Ocean Territory', 'british-indian-ocean-territory'),
+    ('British Virgin Islands', 'british-virgin-islands'), ('Brunei Darussalam', 'brunei-darussalam'),
+    ('Bulgaria', 'bulgaria'), ('Burkina Faso', 'burkina-faso'), ('Burundi', 'burundi'),
+    ('Cambodia', 'cambodia'), ('Cameroon', 'cameroon'), ('Canada', 'canada'), ('Cape Verde', 'cape-verde'),
+    ('Cayman Islands', 'cayman-islands'), ('Central African Republic', 'central-african-republic'),
+    ('Chad', 'chad'), ('Chile', 'chile'), ('China', 'china'), ('Christmas Island', 'christmas-island'),
+    ('Cocos (Keeling) Islands', 'cocos-keeling-islands'), ('Colombia', 'colombia'), ('Comoros', 'comoros'),
+    ('Congo (Brazzaville)', 'congo-brazzaville'), ('Congo (Kinshasa)', 'congo-kinshasa'),
+    ('Cook Islands', 'cook-islands'), ('Costa Rica', 'costa-rica'), ("Côte d'Ivoire", 'cote-divoire'),
+    ('Croatia', 'croatia'), ('Cuba', 'cuba'), ('Cyprus', 'cyprus'), ('Czech Republic', 'czech-republic'),
+    ('Denmark', 'denmark'), ('Djibouti', 'djibouti'), ('Dominica', 'dominica'),
+    ('Dominican Republic', 'dominican-republic'), ('Ecuador', 'ecuador'), ('Egypt', 'egypt'),
+    ('El Salvador', 'el-salvador'), ('Equatorial Guinea', 'equatorial-guinea'), ('Eritrea', 'eritrea'),
+    ('Estonia', 'estonia'), ('Ethiopia', 'ethiopia'),
+    ('Falkland Islands (Malvinas)', 'falkland-islands-malvinas'), ('Faroe Islands', 'faroe-islands'),
+    ('Fiji', 'fiji'), ('Finland', 'finland'), ('France', 'france'), ('French Guiana', 'french-guiana'),
+    ('French Polynesia', 'french-polynesia'),
+    ('French Southern Territories', 'french-southern-territories'), ('Gabon', 'gabon'),
+    ('Gambia', 'gambia'), ('Georgia', 'georgia'), ('Germany', 'germany'), ('Ghana', 'ghana'),
+    ('Gibraltar', 'gibraltar'), ('Greece', 'greece'), ('Greenland', 'greenland'), ('Grenada', 'grenada'),
+    ('Guadeloupe', 'guadeloupe'), ('Guam', 'guam'), ('Guatemala', 'guatemala'), ('Guernsey', 'guernsey'),
+    ('Guinea', 'guinea'), ('Guinea-Bissau', 'guinea-bissau'), ('Guyana', 'guyana'), ('Haiti', 'haiti'),
+    ('Heard and Mcdonald Islands', 'heard-and-mcdonald-islands'),
+    ('Holy See (Vatican City State)', 'holy-see-vatican-city-state'), ('Honduras', 'honduras'),
+    ('Hong Kong, SAR China', 'hong-kong-sar-china'), ('Hungary', 'hungary'), ('Iceland', 'iceland'),
+    ('India', 'india'), ('Indonesia', 'indonesia'), ('Iran, Islamic Republic of', 'iran'), ('Iraq', 'iraq'),
+    ('Ireland', 'ireland'), ('Isle of Man', 'isle-of-man'), ('Israel', 'israel'), ('Italy', 'italy'),
+    ('Jamaica', 'jamaica'), ('Japan', 'japan'), ('Jersey', 'jersey'), ('Jordan', 'jordan'),
+    ('Kazakhstan', 'kazakhstan'), ('Kenya', 'kenya'), ('Kiribati', 'kiribati'),
+    ('Korea (North)', 'korea-north'), ('Korea (South)', 'korea-south'), ('Kosovo', 'kosovo'),
+    ('Kuwait', 'kuwait'), ('Kyrgyzstan', 'kyrgyzstan'), ('Lao PDR', 'lao-pdr'), ('Latvia', 'latvia'),
+    ('Lebanon', 'lebanon'), ('Lesotho', 'lesotho'), ('Liberia', 'liberia'), ('Libya', 'libya'),
+    ('Liechtenstein', 'liechtenstein'), ('Lithuania', 'lithuania'), ('Luxembourg', 'luxembourg'),
+    ('Macao, SAR China', 'macao-sar-china'), ('Macedonia, Republic of', 'macedonia'),
+    ('Madagascar', 'madagascar'), ('Malawi', 'malawi'), ('Malaysia', 'malaysia'), ('Maldives', 'maldives'),
+    ('Mali', 'mali'), ('Malta', 'malta'), ('Marshall Islands', 'marshall-islands'),
+    ('Martinique', 'martinique'), ('Mauritania', 'mauritania'), ('Mauritius', 'mauritius'),
+    ('Mayotte', 'mayotte'), ('Mexico', 'mexico'), ('Micronesia, Federated States of', 'micronesia'),
+    ('Moldova', 'moldova'), ('Monaco', 'monaco'), ('Mongolia', 'mongolia'), ('Montenegro', 'montenegro'),
+    ('Montserrat', 'montserrat'), ('Morocco', 'morocco'), ('Mozambique', 'mozambique'),
+    ('Myanmar', 'myanmar'), ('Namibia', 'namibia'), ('Nauru', 'nauru'), ('Nepal', 'nepal'),
+    ('Netherlands', 'netherlands'), ('Netherlands Antilles', 'netherlands-antilles'),
+    ('New Caledonia', 'new-caledonia'), ('New Zealand', 'new-zealand'), ('Nicaragua', 'nicaragua'),
+    ('Niger', 'niger'), ('Nigeria', 'nigeria'), ('Niue', 'niue'), ('Norfolk Island', 'norfolk-island'),
+    ('Northern Mariana Islands', 'northern-mariana-islands'), ('Norway', 'norway'), ('Oman', 'oman'),
+    ('Pakistan', 'pakistan'), ('Palau', 'palau'), ('Palestinian Territory', 'palestine'),
+    ('Panama', 'panama'), ('Papua New Guinea', 'papua-new-guinea'), ('Paraguay', 'paraguay'),
+    ('Peru', 'peru'), ('Philippines', 'philippines'), ('Pitcairn', 'pitcairn'), ('Poland', 'poland'),
+    ('Portugal', 'portugal'), ('Puerto Rico', 'puerto-rico'), ('Qatar', 'qatar'), ('Réunion', 'réunion'),
+    ('Romania', 'romania'), ('Russian Federation', 'russia'), ('Rwanda', 'rwanda'),
+    ('Saint Helena', 'saint-helena'), ('Saint Kitts and Nevis', 'saint-kitts-and-nevis'),
+    ('Saint Lucia', 'saint-lucia'), ('Saint Pierre and Miquelon', 'saint-pierre-and-miquelon'),
+    ('Saint Vincent and Grenadines', 'saint-vincent-and-grenadines'),
+    ('Saint-Barthélemy', 'saint-barthélemy'), ('Saint-Martin (French part)', 'saint-martin-french-part'),
+    ('Samoa', 'samoa'), ('San Marino', 'san-marino'), ('Sao Tome and Principe', 'sao-tome-and-principe'),
+    ('Saudi Arabia', 'saudi-arabia'), ('Senegal', 'senegal'), ('Serbia', 'serbia'),
+    ('Seychelles', 'seychelles'), ('Sierra Leone', 'sierra-leone'), ('Singapore', 'singapore'),
+    ('Slovakia', 'slovakia'), ('Slovenia', 'slovenia'), ('Solomon Islands', 'solomon-islands'),
+    ('Somalia', 'somalia'), ('South Africa', 'south-africa'),
+    ('South Georgia and the South Sandwich Islands', 'south-georgia-and-the-south-sandwich-islands'),
+    ('South Sudan', 'south-sudan'), ('Spain', 'spain'), ('Sri Lanka', 'sri-lanka'), ('Sudan', 'sudan'),
+    ('Suriname', 'suriname'), ('Svalbard and Jan Mayen Islands', 'svalbard-and-jan-mayen-islands'),
+    ('Swaziland', 'swaziland'), ('Sweden', 'sweden'), ('Switzerland', 'switzerland'),
+    ('Syrian Arab Republic (Syria)', 'syria'), ('Taiwan, Republic of China', 'taiwan'),
+    ('Tajikistan', 'tajikistan'), ('Tanzania, United Republic of', 'tanzania'), ('Thailand', 'thailand'),
+    ('Timor-Leste', 'timor-leste'), ('Togo', 'togo'), ('Tokelau', 'tokelau'), ('Tonga', 'tonga'),
+    ('Trinidad and Tobago', 'trinidad-and-tobago'), ('Tunisia', 'tunisia'), ('Turkey', 'turkey'),
+    ('Turks and Caicos Islands', 'turks-and-caicos-islands'), ('Tuvalu', 'tuvalu'),
+    ('US Minor Outlying Islands', 'us-minor-outlying-islands'), ('Uganda', 'uganda'),
+    ('Ukraine', 'ukraine'), ('United Arab Emirates', 'united-arab-emirates'),
+    ('United Kingdom', 'united-kingdom'), ('United States of America', 'united-states'),
+    ('Uruguay', 'uruguay'), ('Uzbekistan', 'uzbekistan'), ('Vanuatu', 'vanuatu'),
+    ('Venezuela (Bolivarian Republic)', 'venezuela'), ('Viet Nam', 'vietnam'),
+    ('Virgin Islands, US', 'virgin-islands'), ('Wallis and Futuna Islands', 'wallis-and-futuna-islands'),
+    ('Western Sahara', 'western-sahara'), ('Yemen', 'yemen'), ('Zambia', 'zambia'),
+    ('Zimbabwe', 'zimbabwe'),
+]
+
+
+class CountryIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.index = CountryIndex(COUNTRIES + list(COUNTRY_ALIASES.items()))
+
+    def test_lookup_is_normalized(self):
+        self.assertEqual(self.index["germany"], "germany")
+        self.assertEqual(self.index["Korea (South)"], "korea-south")
+        self.assertEqual(self.index["SAINT-BARTHELEMY"], "saint-barthélemy")
+        with self.assertRaises(KeyError):
+            self.index["atlantis"]
+
+    def test_find_all_exact(self):
+        self.assertEqual(self.index.find_all("Cases in France, Italy and the UK?"),
+                         ["france", "italy", "united-kingdom"])
+        self.assertEqual(self.index.find_all("papua new guinea"), ["papua-new-guinea"])
+        self.assertEqual(self.index.find_all("deaths in south korea"), ["korea-south"])
+
+    def test_find_all_corrects_typos(self):
+        self.assertEqual(self.index.find_all("how many cases in germny"), ["germany"])
+        self.assertEqual(self.index.find_all("deaths in the untied states"), ["united-states"])
+        self.assertEqual(self.index.find_all("plot swizterland and nigeira"), ["switzerland", "nigeria"])
+
+    def test_find_all_ignores_ordinary_words(self):
+        for text in ["what are the symptoms in a child", "my sedan", "how does it stain",
+                     "chili recipes", "nigel says hi", "libra horoscope", "a swede", "swedes",
+                     "as stated earlier", "how are you today"]:
+            self.assertEqual(self.index.find_all(text), [], text)
+
+    def test_find_all_ignores_words_close_to_countries(self):
+        for text in ["i'm so hungry", "columbia university", "angela merkel", "pajama party",
+                     "the queen's gambit", "prices in francs", "a family reunion"]:
+            self.assertEqual(self.index.find_all(text), [], text)
+
+    def test_ordinary_words_are_never_countries(self):
+        for word in COMMON_WORDS:
+            self.assertEqual(self.index.find_all("the {} thing".format(word)), [], word)
+            if word != "reunion":
+                self.assertEqual(self.index.find_all("cases in {}".format(word)), [], word)
+
+    def test_every_country_is_found(self):
+        for name, slug in COUNTRIES:
+            self.assertEqual(self.index.find_all("deaths in {}".format(name)), [slug], name)
+            if name != "Réunion":
+                self.assertEqual(self.index.find_all("{} deaths".format(name)), [slug], name)
+
+    def test_correction_where_a_country_is_expected(self):
+        self.assertEqual(self.index.find_all("cases in hungray"), ["hungary"])
+        self.assertEqual(self.index.find_all("cases in france, italy and germny"), ["france", "italy", "germany"])
+        self.assertEqual(self.index.find_all("deaths in reunion"), ["réunion"])
+
+    def test_exact_match_wins_over_correction(self):
+        self.assertEqual(self.index.find_all("niger and nigeria"), ["niger", "nigeria"])
+        self.assertEqual(self.index.find_all("sudan"), ["sudan"])
+
+
+class TextTest(unittest.TestCase):
+    def test_normalize(self):
+        self.assertEqual(normalize("Guinea-Bissau"), "guinea bissau")
+        self.assertEqual(normalize("  Côte d'Ivoire "), "cote d ivoire")
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance("germany", "germany"), 0)
+        self.assertEqual(edit_distance("germny", "germany"), 1)
+        self.assertEqual(edit_distance("untied", "united"), 1)
+        self.assertEqual(edit_distance("", "abc"), 3)
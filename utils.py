@@ -1,47 +1,318 @@
-from collections.abc import MutableMapping, Mapping
-from collections import OrderedDict
-
-class CaseAgnosticDict(MutableMapping):
-    """
-    Case agnostic dictionary like object. Inspired from a similar 
-    data structure in `requests`
-    """
-    def __init__(self, data=None, **kwargs):
-        self._internal_dict = OrderedDict()
-        if data is None:
-            data = {}
-        self.update(data, **kwargs)
-    
-    def __setitem__(self, key, value):
-        # Only supports strings as keys
-        self._internal_dict[key.lower()] = (key, value)
-    
-    def __getitem__(self, key):
-        _, actual_value = self._internal_dict[key.lower()]
-        return actual_value
-    
-    def __delitem__(self, key):
-        del self._internal_dict[key.lower()]
-    
+from collections.abc import Mapping
+import unicodedata
+import re
+
+_TOKEN_REGEX = re.compile(r"\w+")
+
+# English stopwords and common words of the messages the bot gets. They are
+# never corrected to a country name, whatever their spelling is close to,
+# and the ones that are a country name ("reunion") are only taken for one
+# where a country is expected (see `CountryIndex.find_all`).
+COMMON_WORDS = frozenset("""
+    a about above after again against all also am an and any are as at be because been before
+    being below between both but by can could did do does doing down during each few for from
+    further had has have having he her here hers herself him himself his how i if in into is it
+    its itself just me more most my myself no nor not now of off on once only or other our ours
+    ourselves out over own same she should so some such than that the their theirs them
+    themselves then there these they this those through to too under until up very was we were
+    what when where which while who whom why will with would you your yours yourself yourselves
+    please thanks thank hello hey hi bye today yesterday tomorrow people person persons child
+    children adults elderly family friends number numbers total totals latest update updates
+    status stats statistics figures report reported reports right around across within without
+    world global country countries nation nations state stated states region regions city
+    cities compare compared comparing comparison versus between change changes changed chart
+    charts graph graphs plot plots plotted plotting figure curve curves trend trends scale
+    linear logarithmic confirmed confirm cases case infected infection infections positive
+    tested testing tests deaths death died dying dead fatalities recovered recovery recoveries
+    recover active symptoms symptom fever cough coughing breathing spread spreads spreading
+    prevent prevention protect protection masks washing hands vaccine vaccines vaccinated cure
+    treatment medicine doctor hospital hospitals sick illness disease virus viruses corona
+    coronavirus covid pandemic epidemic outbreak lockdown quarantine isolation distancing
+    average averages rolling daily weekly growth growing doubling rising falling highest lowest
+    ranking ranked ranks worst better worse should another little second stain stains sedan
+    sedans chili chilli libra swede swedes nigel island islands indians hungry angela angora
+    columbia pajama pajamas gambit francs grenade reunion
+""".split())
+
+# Words after which a country name is expected ("cases in ...")
+_COUNTRY_CUES = frozenset(("in", "for", "of"))
+# Words that join the items of a list ("france and ...")
+_LIST_WORDS = frozenset(("and", "or", "vs", "versus"))
+
+
+def tokenize(text):
+    """
+    Split a text into lower case word tokens. Punctuation, hyphens and 
+    whitespace all act as separators and accents are dropped, so 
+    "Guinea-Bissau", "guinea bissau" and "Guinea, Bissau" give the same 
+    tokens, as do "Saint-Barthélemy" and "saint barthelemy".
+    """
+    text = text.lower()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return _TOKEN_REGEX.findall(text)
+
+
+def normalize(text):
+    """Normalized form of a name: its tokens (see `tokenize`) joined by single spaces."""
+    return " ".join(tokenize(text))
+
+
+def _max_edits(length):
+    """Number of typos tolerated in a word of `length` characters."""
+    if length >= 9:
+        return 2
+    if length >= 6:
+        return 1
+    return 0
+
+
+def _deletions(word, max_edits):
+    """`word` and every string obtained by deleting up to `max_edits` characters from it."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(max_edits):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a, b):
+    """
+    Number of insertions, deletions, substitutions and transpositions of 
+    adjacent characters needed to turn `a` into `b` (optimal string 
+    alignment distance).
+    """
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class _TypoIndex:
+    """
+    Corrects misspelled words against a fixed vocabulary (symmetric delete
+    index: every word is stored under each string obtained by deleting a
+    few of its characters, so candidates for a misspelling are found with
+    a handful of hash lookups rather than a scan of the vocabulary).
+
+    A word is corrected to the closest vocabulary word with the same first
+    letter, within `_max_edits` of the length of both words: none for
+    words of 5 characters or less, 1 up to 8 characters and 2 beyond.
+    Words in `ignore` (ordinary words such as "stated" or "hungry") are 
+    never corrected, and with `strict` neither are words with several
+    closest vocabulary words.
+    """
+    _CACHE_SIZE = 10000
+
+    def __init__(self, words, ignore=COMMON_WORDS):
+        self._words = frozenset(words)
+        self._ignore = ignore
+        self._deletes = {}  # deletion variant -> [vocabulary words]
+        for word in self._words:
+            for variant in _deletions(word, _max_edits(len(word))):
+                self._deletes.setdefault(variant, []).append(word)
+        self._cache = {}  # word -> (closest vocabulary word or None, whether it is the only one)
+
+    def correct(self, word, strict=False):
+        """Returns the vocabulary word `word` is a typo of, or `word` itself."""
+        if word in self._words:
+            return word
+        max_edits = _max_edits(len(word))
+        if not max_edits or word in self._ignore:
+            return word
+        match = self._cache.get(word)
+        if match is None:
+            candidates = set()
+            for variant in _deletions(word, max_edits):
+                candidates.update(self._deletes.get(variant, ()))
+            best, unique = None, True
+            for candidate in candidates:
+                if candidate[0] != word[0]:
+                    continue
+                distance = edit_distance(word, candidate)
+                if distance > min(max_edits, _max_edits(len(candidate))):
+                    continue
+                if best is not None and distance == best[0]:
+                    unique = False
+                if best is None or distance < best[0]:
+                    unique = True
+                if best is None or (distance, candidate) < best:
+                    best = distance, candidate
+            match = (best[1] if best is not None else None), unique
+            if len(self._cache) >= self._CACHE_SIZE:
+                self._cache.clear()
+            self._cache[word] = match
+        correction, unique = match
+        if correction is None or (strict and not unique):
+            return word
+        return correction
+
+
+class CountryTrie:
+    """
+    Token trie over country names, used to find every country mentioned in
+    a message in a single left-to-right pass, whatever the number of names
+    and however many words they have.
+
+    Parameters
+    ----------
+    aliases : iterable of (str, str)
+        (name, country code) pairs, e.g. ("United States", "united-states")
+    """
+    _END = None  # Key under which a trie node stores its country code
+
+    def __init__(self, aliases):
+        self._root = {}
+        for name, slug in aliases:
+            tokens = tokenize(name)
+            if not tokens or not slug:
+                continue
+            node = self._root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[self._END] = slug
+
+    def find_all(self, text):
+        """
+        Find the countries mentioned in `text`. At every position the longest
+        matching name wins, so "papua new guinea" doesn't also yield "guinea".
+
+        Returns
+        -------
+        [str]: Country codes in order of appearance (may contain repeats)
+        """
+        return self.find_tokens(tokenize(text))
+
+    def find_tokens(self, tokens, fallback=None):
+        """
+        Same as `find_all`, for a text that is already tokenized.
+
+        Parameters
+        ----------
+        tokens : [str]
+        fallback : [str]
+            Alternative tokens (e.g. spelling corrections), one per token,
+            matched at the positions where no name matches `tokens` exactly
+        """
+        return [slug for _, _, slug in self.find_spans(tokens, fallback)]
+
+    def find_spans(self, tokens, fallback=None):
+        """
+        Same as `find_tokens`, with the positions of the names.
+
+        Returns
+        -------
+        [(int, int, str)]: (start, end, country code) of the names found,
+            in order
+        """
+        spans = []
+        i = 0
+        while i < len(tokens):
+            match_slug, match_end = self._match(tokens, i)
+            if match_slug is None and fallback is not None:
+                match_slug, match_end = self._match(fallback, i)
+            if match_slug is not None:
+                spans.append((i, match_end, match_slug))
+                i = match_end
+            else:
+                i += 1
+        return spans
+
+    def _match(self, tokens, i):
+        """(country code, end position) of the longest name starting at `i`, or (None, i)."""
+        node = self._root
+        match_slug, match_end = None, i
+        j = i
+        while j < len(tokens):
+            node = node.get(tokens[j])
+            if node is None:
+                break
+            j += 1
+            if self._END in node:
+                match_slug, match_end = node[self._END], j
+        return match_slug, match_end
+
+
+class CountryIndex(Mapping):
+    """
+    Frozen index of country names (and alternate names) to country codes.
+
+    Names are normalized once, when the index is built (see `normalize`), 
+    so "Saint-Barthélemy", "saint barthelemy" and "SAINT BARTHELEMY" are 
+    the same key. Looking up an already normalized name is a single dict
+    lookup. Misspelled country names in messages ("germny", "untied states")
+    are still found by `find_all`, see `_TypoIndex` for the tolerance.
+
+    Parameters
+    ----------
+    aliases : iterable of (str, str)
+        (name, country code) pairs. For duplicate names the last pair wins.
+    """
+    def __init__(self, aliases):
+        self._slugs = {}  # normalized name -> country code
+        for name, slug in aliases:
+            key = normalize(name)
+            if key and slug:
+                self._slugs[key] = slug
+        self._trie = CountryTrie(self._slugs.items())
+        self._typos = _TypoIndex(token for name in self._slugs for token in name.split())
+
+    def __getitem__(self, name):
+        slug = self._slugs.get(name)
+        if slug is None:
+            slug = self._slugs[normalize(name)]
+        return slug
+
     def __iter__(self):
-        # Return generator. Case sensitive
-        return (casedkey for casedkey, value in self._internal_dict.values())
-    
+        return iter(self._slugs)
+
     def __len__(self):
-        return len(self._internal_dict)
-    
-    def lower_items(self):
-        return ((lowerkey, val[1]) for (lowerkey, val) in self._internal_dict.items())
-    
+        return len(self._slugs)
+
     def __repr__(self):
-        return str({lowerkey: val[1] for (lowerkey, val) in self._internal_dict.items()})
-    
-    def copy(self):
-        return CaseAgnosticDict(dict(self.lower_items()))
-    
-    def __eq__(self, other):
-        if isinstance(other, Mapping):
-            other = CaseAgnosticDict(other)
-        else:
-            return NotImplemented
-        return dict(self.lower_items()) == dict(other.lower_items())
\ No newline at end of file
+        return "CountryIndex({} names)".format(len(self))
+
+    def find_all(self, text):
+        """
+        Find the countries mentioned in `text`, tolerating typos in the names.
+        Corrected words are only tried where no name matches exactly.
+
+        Where a country is expected (after "in", "for" or "of", or next to 
+        another country in a list), a word is corrected to its closest 
+        country name. Elsewhere only words with a single closest name are.
+        Ordinary words (`COMMON_WORDS`) are never corrected, so "so hungry"
+        doesn't mention Hungary, and one that is a country name ("a family 
+        reunion") only counts where a country is expected.
+
+        Returns
+        -------
+        [str]: Country codes in order of appearance (may contain repeats)
+        """
+        tokens = tokenize(text)
+        expected = set()
+        for i, token in enumerate(tokens):
+            if token in _COUNTRY_CUES:
+                expected.add(i + 2 if tokens[i + 1:i + 2] == ["the"] else i + 1)
+
+        def found(start, end):
+            # A name that is an ordinary word, e.g. "reunion", needs a cue
+            return end - start > 1 or tokens[start] not in COMMON_WORDS or start in expected
+
+        for start, end, _ in self._trie.find_spans(tokens):
+            if found(start, end):
+                expected.update((start - 1, end))
+                if start >= 2 and tokens[start - 1] in _LIST_WORDS:
+                    expected.add(start - 2)
+                if end + 1 < len(tokens) and tokens[end] in _LIST_WORDS:
+                    expected.add(end + 1)
+
+        corrected = [self._typos.correct(token, strict=i not in expected) for i, token in enumerate(tokens)]
+        spans = self._trie.find_spans(tokens, corrected if corrected != tokens else None)
+        return [slug for start, end, slug in spans if found(start, end)]